@@ -0,0 +1,94 @@
+"""
+BLIP caption modeli - paylaşılan model ve inference yardımcıları.
+
+Caption'lar greedy decode (num_beams=1) ile üretilir; beam search'e göre
+biraz daha genel caption'lar çıkabilir ama token başına maliyet beam
+sayısı kadar azalır. Instagram özetleri için bu kalite yeterli.
+"""
+from transformers import BlipProcessor, BlipForConditionalGeneration
+from contextlib import nullcontext
+from PIL import Image
+from typing import List
+import threading
+import torch
+import os
+
+MODEL_NAME = "Salesforce/blip-image-captioning-base"
+
+# Tek generate çağrısında işlenecek görsel sayısı
+BLIP_BATCH = int(os.getenv("BLIP_BATCH", 8))
+
+# Varsayılan generate ayarları - greedy decode, kısa caption
+GENERATE_KWARGS = {
+    "num_beams": 1,
+    "do_sample": False,
+    "use_cache": True,
+    "max_new_tokens": 30,
+}
+
+# Singleton instance - model her istekte yeniden yüklenmesin
+_blip_processor = None
+_blip_model = None
+_blip_lock = threading.Lock()
+
+# GPU'da aynı anda tek inference - eşzamanlı isteklerde VRAM çekişmesini önler
+_inference_lock = threading.Lock()
+
+
+def _select_dtype() -> torch.dtype:
+    """GPU'da yarı hassasiyet (Ampere+ için BF16, diğerleri FP16), CPU'da FP32"""
+    if not torch.cuda.is_available():
+        return torch.float32
+    if torch.cuda.get_device_capability()[0] >= 8:
+        return torch.bfloat16
+    return torch.float16
+
+
+def get_blip():
+    """BLIP processor ve modelini bir kez yükleyip (processor, model) döner"""
+    global _blip_processor, _blip_model
+    if _blip_model is None:
+        with _blip_lock:
+            if _blip_model is None:
+                device = "cuda" if torch.cuda.is_available() else "cpu"
+                _blip_processor = BlipProcessor.from_pretrained(MODEL_NAME)
+                model = BlipForConditionalGeneration.from_pretrained(MODEL_NAME).to(
+                    device, dtype=_select_dtype()
+                ).eval()
+                _blip_model = _optimize_vision_encoder(model)
+    return _blip_processor, _blip_model
+
+
+def _optimize_vision_encoder(model):
+    """GPU'da vision encoder'ı channels-last + torch.compile ile hızlandır (torch 2.0+)"""
+    if model.device.type != "cuda":
+        return model
+    model = model.to(memory_format=torch.channels_last)
+    if hasattr(torch, "compile"):
+        model.vision_model = torch.compile(model.vision_model, mode="reduce-overhead", fullgraph=False)
+    return model
+
+
+def warmup_blip():
+    """Modeli yükle ve derlenmiş grafiği dummy bir görselle ısıt"""
+    generate_captions([Image.new("RGB", (384, 384))])
+
+
+def generate_captions(images: List, **generate_kwargs) -> List[str]:
+    """Görsel listesi için tek generate çağrısıyla caption üret"""
+    processor, model = get_blip()
+
+    inputs = processor(images=images, return_tensors="pt").to(model.device)
+    # pixel_values model dtype'ına çevrilmeli (FP16/BF16)
+    inputs["pixel_values"] = inputs["pixel_values"].to(model.dtype)
+    if model.device.type == "cuda":
+        inputs["pixel_values"] = inputs["pixel_values"].contiguous(memory_format=torch.channels_last)
+
+    autocast = (
+        torch.autocast(device_type="cuda", dtype=model.dtype)
+        if model.device.type == "cuda" else nullcontext()
+    )
+    with _inference_lock, torch.inference_mode(), autocast:
+        out = model.generate(**inputs, **{**GENERATE_KWARGS, **generate_kwargs})
+
+    return processor.batch_decode(out, skip_special_tokens=True)
@@ -1,24 +1,19 @@
-from transformers import BlipProcessor, BlipForConditionalGeneration
+from helpers.blip_helper import generate_captions
 from PIL import Image
-import torch
+
+
+def load_image(file_path: str) -> Image.Image:
+    """Görüntüyü RGB olarak yükle"""
+    return Image.open(file_path).convert("RGB")
 
 
 def analyze_image(file_path: str):
     try:
-        # Model ve processor yükle
-        model_name = "Salesforce/blip-image-captioning-base"
-        processor = BlipProcessor.from_pretrained(model_name)
-        model = BlipForConditionalGeneration.from_pretrained(model_name).to(
-            "cuda" if torch.cuda.is_available() else "cpu"
-        )
-
         # Görüntüyü yükle
-        image = Image.open(file_path).convert("RGB")
+        image = load_image(file_path)
 
         # Caption üret - sizin verdiğiniz yapıyla aynı
-        inputs = processor(images=image, return_tensors="pt").to(model.device)
-        out = model.generate(**inputs)
-        caption = processor.decode(out[0], skip_special_tokens=True)
+        caption = generate_captions([image])[0]
 
         return {
             "type": "image", 
@@ -1,89 +1,110 @@
 from sentence_transformers import SentenceTransformer
-from sklearn.feature_extraction.text import TfidfVectorizer
-from sklearn.metrics.pairwise import cosine_similarity
 import nltk
 from nltk.corpus import stopwords
-from nltk.tokenize import word_tokenize
 from nltk.stem import PorterStemmer
+import os
 import re
+import threading
+import numpy as np
+from collections import Counter, OrderedDict
 from typing import List, Dict, Any
 import logging
 
 logger = logging.getLogger(__name__)
 
-# NLTK verilerini indir (ilk çalıştırmada)
-try:
-    nltk.data.find('tokenizers/punkt')
-    nltk.data.find('corpora/stopwords')
-except LookupError:
-    nltk.download('punkt', quiet=True)
-    nltk.download('stopwords', quiet=True)
+# Embedding ayarları
+ST_BATCH = int(os.getenv("ST_BATCH", 32))
+EMBEDDING_CACHE_SIZE = 4096
+
+# NLTK verilerini indir (ilk çalıştırmada) - container'da corpora hazırsa NLTK_READY=1 ile atlanır
+if os.getenv("NLTK_READY") != "1":
+    try:
+        nltk.data.find('corpora/stopwords')
+    except LookupError:
+        nltk.download('stopwords', quiet=True)
+
+# Modül seviyesinde bir kez hazırlanan sabitler
+_RE_NONALNUM = re.compile(r'[^a-zA-Z0-9\s]')
+_RE_WS = re.compile(r'\s+')
+_STOPWORDS = frozenset(stopwords.words('english'))
+_STEMMER = PorterStemmer()
 
 class TextProcessor:
     def __init__(self):
         self.sentence_model = None
-        self.stemmer = PorterStemmer()
-        self.stop_words = set(stopwords.words('english'))
+        self.stemmer = _STEMMER
+        self.stop_words = _STOPWORDS
+        self._embedding_cache = OrderedDict()
+        self._embedding_lock = threading.Lock()
+        self._model_lock = threading.Lock()
         
     def _load_sentence_model(self):
         """Sentence transformer modelini lazy loading ile yükle"""
         if self.sentence_model is None:
-            self.sentence_model = SentenceTransformer('all-MiniLM-L6-v2')
-            logger.info("✅ Sentence Transformer modeli yüklendi")
+            with self._model_lock:
+                if self.sentence_model is None:
+                    self.sentence_model = SentenceTransformer('all-MiniLM-L6-v2')
+                    logger.info("✅ Sentence Transformer modeli yüklendi")
         return self.sentence_model
     
+    def _encode(self, texts: List[str]) -> np.ndarray:
+        """Normalize embeddings üret - önbellekte olmayan metinler tek batch'te encode edilir"""
+        found = {}
+        with self._embedding_lock:
+            for text in texts:
+                if text in self._embedding_cache:
+                    self._embedding_cache.move_to_end(text)
+                    found[text] = self._embedding_cache[text]
+        
+        misses = [text for text in dict.fromkeys(texts) if text not in found]
+        if misses:
+            model = self._load_sentence_model()
+            embeddings = model.encode(
+                misses,
+                batch_size=ST_BATCH,
+                normalize_embeddings=True,
+                convert_to_numpy=True,
+                show_progress_bar=False
+            )
+            with self._embedding_lock:
+                for text, embedding in zip(misses, embeddings):
+                    found[text] = embedding
+                    self._embedding_cache[text] = embedding
+                while len(self._embedding_cache) > EMBEDDING_CACHE_SIZE:
+                    self._embedding_cache.popitem(last=False)
+        
+        return np.stack([found[text] for text in texts])
+    
     def clean_text(self, text: str) -> str:
         """Metni temizle ve normalize et"""
         if not text:
             return ""
         
-        # Küçük harfe çevir
-        text = text.lower()
-        
-        # Özel karakterleri temizle
-        text = re.sub(r'[^a-zA-Z0-9\s]', '', text)
-        
-        # Fazla boşlukları temizle
-        text = re.sub(r'\s+', ' ', text).strip()
-        
-        return text
+        # Küçük harfe çevir, özel karakterleri ve fazla boşlukları temizle
+        return _RE_WS.sub(' ', _RE_NONALNUM.sub('', text.lower())).strip()
     
     def extract_keywords(self, text: str, max_keywords: int = 10) -> List[str]:
-        """TF-IDF kullanarak anahtar kelimeleri çıkar"""
+        """Terim frekansına göre anahtar kelimeleri çıkar"""
         try:
             if not text:
                 return []
             
-            # Metni temizle
-            clean_text = self.clean_text(text)
-            
-            # Tokenize et
-            tokens = word_tokenize(clean_text)
+            # Metni temizle ve tokenize et - noktalama zaten temizlendi
+            tokens = self.clean_text(text).split()
             
             # Stop words'leri filtrele ve stem et
-            filtered_tokens = []
-            for token in tokens:
-                if token not in self.stop_words and len(token) > 2:
-                    stemmed = self.stemmer.stem(token)
-                    filtered_tokens.append(stemmed)
+            filtered_tokens = [
+                _STEMMER.stem(token)
+                for token in tokens
+                if len(token) > 2 and token not in _STOPWORDS
+            ]
             
             if not filtered_tokens:
                 return []
             
-            # TF-IDF ile anahtar kelimeleri bul
-            vectorizer = TfidfVectorizer(max_features=max_keywords * 2)
-            tfidf_matrix = vectorizer.fit_transform([' '.join(filtered_tokens)])
-            
-            # Feature names ve scores'ları al
-            feature_names = vectorizer.get_feature_names_out()
-            tfidf_scores = tfidf_matrix.toarray()[0]
-            
-            # Score'lara göre sırala
-            word_scores = list(zip(feature_names, tfidf_scores))
-            word_scores.sort(key=lambda x: x[1], reverse=True)
-            
-            # En yüksek score'lu kelimeleri döndür
-            keywords = [word for word, score in word_scores[:max_keywords] if score > 0]
+            # Tek doküman için IDF sabit - TF sıralaması yeterli
+            counts = Counter(filtered_tokens)
+            keywords = [word for word, _ in counts.most_common(max_keywords)]
             
             return keywords
             
@@ -94,9 +115,9 @@ class TextProcessor:
     def generate_embeddings(self, texts: List[str]) -> List[List[float]]:
         """Metinler için embeddings oluştur"""
         try:
-            model = self._load_sentence_model()
-            embeddings = model.encode(texts)
-            return embeddings.tolist()
+            if not texts:
+                return []
+            return self._encode(texts).tolist()
         except Exception as e:
             logger.error(f"Embedding generation hatası: {e}")
             return []
@@ -104,27 +125,30 @@ class TextProcessor:
     def find_similar_texts(self, query_text: str, candidate_texts: List[str], top_k: int = 5) -> List[Dict[str, Any]]:
         """Query text'e benzer metinleri bul"""
         try:
-            model = self._load_sentence_model()
+            if not candidate_texts:
+                return []
             
-            # Embeddings oluştur
-            query_embedding = model.encode([query_text])
-            candidate_embeddings = model.encode(candidate_texts)
+            # Query ve adaylar tek encode çağrısında - cosine similarity tek dot product'a iner
+            embeddings = self._encode([query_text] + list(candidate_texts))
+            query_embedding, candidate_embeddings = embeddings[0], embeddings[1:]
             
-            # Cosine similarity hesapla
-            similarities = cosine_similarity(query_embedding, candidate_embeddings)[0]
+            similarities = candidate_embeddings @ query_embedding
             
-            # Sonuçları sırala
-            results = []
-            for i, similarity in enumerate(similarities):
-                results.append({
-                    "text": candidate_texts[i],
-                    "similarity": float(similarity),
-                    "index": i
-                })
+            # Sadece top_k için kısmi sıralama
+            k = min(top_k, len(similarities))
+            if k <= 0:
+                return []
+            top_indices = np.argpartition(-similarities, k - 1)[:k]
+            top_indices = top_indices[np.argsort(-similarities[top_indices])]
             
-            # Similarity'ye göre sırala ve top_k döndür
-            results.sort(key=lambda x: x["similarity"], reverse=True)
-            return results[:top_k]
+            return [
+                {
+                    "text": candidate_texts[i],
+                    "similarity": float(similarities[i]),
+                    "index": int(i)
+                }
+                for i in top_indices
+            ]
             
         except Exception as e:
             logger.error(f"Text similarity hatası: {e}")
@@ -144,16 +168,31 @@ class TextProcessor:
             else:
                 combined_keywords = extracted_keywords
             
+            # Metni bir kez küçült ve token'la
+            low_text = all_text.lower()
+            tokens = self.clean_text(all_text).split()
+            token_total = len(tokens) or 1
+            token_counts = Counter(tokens)
+            
+            # Çıkarılan keyword'ler stem halinde - stem sayımlarını da tut
+            stem_counts = Counter()
+            for token, count in token_counts.items():
+                stem_counts[_STEMMER.stem(token)] += count
+            
             # Keyword'leri analiz et
             keyword_analysis = []
             for keyword in combined_keywords[:10]:  # En iyi 10 keyword
                 # Keyword'ün text içindeki frequency'sini hesapla
-                frequency = all_text.lower().count(keyword.lower())
+                keyword_low = keyword.lower()
+                if ' ' in keyword_low:
+                    frequency = low_text.count(keyword_low)
+                else:
+                    frequency = max(token_counts.get(keyword_low, 0), stem_counts.get(keyword_low, 0))
                 
                 keyword_analysis.append({
                     "keyword": keyword,
                     "frequency": frequency,
-                    "relevance_score": frequency / len(all_text.split()) if all_text else 0
+                    "relevance_score": frequency / token_total if all_text else 0
                 })
             
             # Relevance score'a göre sırala
@@ -175,6 +214,33 @@ class TextProcessor:
                 "total_keywords": 0
             }
     
+    def dedup_by_embedding(self, captions: List[str], threshold: float = 0.9) -> List[str]:
+        """Neredeyse aynı caption'ları kümele, her kümeden en uzun caption'ı döndür (büyük küme önce)"""
+        unique = list(dict.fromkeys(captions))
+        if len(unique) <= 1:
+            return unique
+        
+        try:
+            embeddings = self._encode(unique)
+            similarities = embeddings @ embeddings.T
+            
+            # Greedy kümeleme
+            visited = np.zeros(len(unique), dtype=bool)
+            clusters = []
+            for i in range(len(unique)):
+                if visited[i]:
+                    continue
+                members = np.flatnonzero(~visited & (similarities[i] >= threshold))
+                visited[members] = True
+                clusters.append(members)
+            
+            clusters.sort(key=len, reverse=True)
+            return [max((unique[j] for j in members), key=len) for members in clusters]
+            
+        except Exception as e:
+            logger.error(f"Caption deduplication hatası: {e}")
+            return unique
+    
     def summarize_content(self, visual_captions: List[str], video_captions: List[str] = None) -> Dict[str, str]:
         """Görsel ve video caption'larından özet oluştur"""
         try:
@@ -193,8 +259,8 @@ class TextProcessor:
             if video_captions:
                 video_captions_clean = [cap for cap in video_captions if cap and len(cap.strip()) > 10]
                 if video_captions_clean:
-                    # Video için birden fazla caption'ı birleştir
-                    unique_captions = list(set(video_captions_clean))
+                    # Video için birden fazla caption'ı birleştir - en kalabalık kümeler önce
+                    unique_captions = self.dedup_by_embedding(video_captions_clean)
                     if len(unique_captions) > 1:
                         video_summary = f"Video shows: {', '.join(unique_captions[:3])}"
                     else:
@@ -217,9 +283,12 @@ class TextProcessor:
 
 # Singleton instance
 _text_processor = None
+_text_processor_lock = threading.Lock()
 
 def get_text_processor() -> TextProcessor:
     global _text_processor
     if _text_processor is None:
-        _text_processor = TextProcessor()
+        with _text_processor_lock:
+            if _text_processor is None:
+                _text_processor = TextProcessor()
     return _text_processor
@@ -1,50 +1,53 @@
 import cv2
-from transformers import BlipProcessor, BlipForConditionalGeneration
-from PIL import Image
-import torch
+import numpy as np
+from helpers.blip_helper import generate_captions, BLIP_BATCH
+from typing import List, Tuple
+
+def sample_video_frames(file_path: str, frame_interval=60) -> Tuple[List[np.ndarray], List[int], int]:
+    """Videodan örnek frame'leri (frames, frame_ids, total_frames) olarak döner"""
+    cap = cv2.VideoCapture(file_path)
+    total_frames = int(cap.get(cv2.CAP_PROP_FRAME_COUNT))
+
+    # Sadece örnek frame'lere seek et - aradaki frame'ler decode edilmez
+    frames = []
+    frame_ids = []
+    for frame_id in range(0, total_frames, frame_interval):
+        cap.set(cv2.CAP_PROP_POS_FRAMES, frame_id)
+        ret, frame = cap.read()
+        if not ret:
+            break
+
+        # BGR -> RGB tek kopya ile; BLIP processor ndarray'i doğrudan kabul eder
+        frames.append(np.ascontiguousarray(frame[:, :, ::-1]))
+        frame_ids.append(frame_id)
+
+    cap.release()
+    return frames, frame_ids, total_frames
 
 def analyze_video(file_path: str, frame_interval=60):
     try:
-        cap = cv2.VideoCapture(file_path)
-        total_frames = int(cap.get(cv2.CAP_PROP_FRAME_COUNT))
-
-        # Model ve processor yükle
-        model_name = "Salesforce/blip-image-captioning-base"
-        processor = BlipProcessor.from_pretrained(model_name)
-        model = BlipForConditionalGeneration.from_pretrained(model_name).to(
-            "cuda" if torch.cuda.is_available() else "cpu"
-        )
+        frames, frame_ids, total_frames = sample_video_frames(file_path, frame_interval)
 
+        # Frame'leri batch halinde caption'la
         results = []
-        frame_id = 0
-        while True:
-            ret, frame = cap.read()
-            if not ret:
-                break
-
-            if frame_id % frame_interval == 0:
-                try:
-                    # Frame'i direkt RAM üzerinden dönüştür
-                    image = Image.fromarray(cv2.cvtColor(frame, cv2.COLOR_BGR2RGB))
-                    inputs = processor(images=image, return_tensors="pt")
-                    inputs = {k: v.to(model.device) for k, v in inputs.items()}
-                    out = model.generate(**inputs, max_new_tokens=50)
-                    caption = processor.decode(out[0], skip_special_tokens=True)
-
-                    results.append({"frame": frame_id, "caption": caption})
-                except Exception as e:
-                    results.append({"frame": frame_id, "caption": f"Error: {str(e)}"})
-            
-            frame_id += 1
-
-        cap.release()
+        for start in range(0, len(frames), BLIP_BATCH):
+            chunk_ids = frame_ids[start:start + BLIP_BATCH]
+            try:
+                captions = generate_captions(frames[start:start + BLIP_BATCH])
+
+                for fid, caption in zip(chunk_ids, captions):
+                    results.append({"frame": fid, "caption": caption})
+            except Exception as e:
+                for fid in chunk_ids:
+                    results.append({"frame": fid, "caption": f"Error: {str(e)}"})
+
         return {
             "type": "video",
             "captions": results,
             "total_frames": total_frames,
             "status": "success"
         }
-        
+
     except Exception as e:
         return {
             "type": "video",
@@ -1,7 +1,15 @@
 from fastapi import FastAPI
 from routes import analyses_route
+from helpers.blip_helper import warmup_blip
+from helpers.text_helper import get_text_processor
+from modules.drive_client import get_drive_client, TOKEN_PATH
+import asyncio
+import os
+import logging
 import uvicorn
 
+logger = logging.getLogger(__name__)
+
 app = FastAPI(
     title="Service Analysis - İçerik Analiz Servisi",
     description="Google Drive'dan dosyaları çekip AI ile analiz eder",
@@ -12,6 +20,25 @@ app = FastAPI(
 # Route include
 app.include_router(analyses_route.router)
 
+@app.on_event("startup")
+async def warmup():
+    """Modelleri ve Drive client'ı ilk istekten önce yükle"""
+    warmup_steps = {
+        "BLIP": warmup_blip,
+        "Sentence Transformer": lambda: get_text_processor()._load_sentence_model(),
+    }
+    # Token yoksa OAuth akışı tarayıcı bekler - startup'ı bloklamasın, ilk Drive isteğinde yapılır
+    if os.path.exists(TOKEN_PATH):
+        warmup_steps["Google Drive"] = get_drive_client
+    else:
+        logger.info("ℹ️ Google Drive token'ı yok, Drive ön yüklemesi atlandı")
+    for name, step in warmup_steps.items():
+        try:
+            await asyncio.to_thread(step)
+            logger.info(f"🔥 {name} hazır")
+        except Exception as e:
+            logger.warning(f"⚠️ {name} ön yüklemesi başarısız: {e}")
+
 @app.get("/")
 def root():
     return {"message": "Content Analysis Service is running", "service": "service_analysis"}
@@ -1,7 +1,8 @@
-from helpers.image_helper import analyze_image
-from helpers.video_helper import analyze_video
+from helpers.image_helper import analyze_image, load_image
+from helpers.video_helper import analyze_video, sample_video_frames
+from helpers.blip_helper import generate_captions, BLIP_BATCH
 from helpers.text_helper import get_text_processor
-from typing import List, Dict, Any, Optional
+from typing import Iterable, List, Dict, Any, Optional, Tuple
 
 class ContentAgent:
     def __init__(self):
@@ -16,6 +17,78 @@ class ContentAgent:
         else:
             return {"error": "Unsupported file type"}
     
+    def analyze_many(self, files: Iterable[Tuple[str, str]]) -> List[Dict[str, Any]]:
+        """
+        Çoklu dosya analizi - tüm görseller ve video frame'leri tek batch'li BLIP akışında.
+        files lazily tüketilir: BLIP_BATCH görsel birikince caption'lanır, böylece
+        indirmeler sürerken (generator'dan gelen dosyalar) inference başlar.
+        
+        Args:
+            files: (file_path, mime_type) listesi veya iterable'ı
+            
+        Returns:
+            files ile aynı sırada, analyze() formatında sonuç listesi
+        """
+        results: List[Optional[Dict[str, Any]]] = []
+        images = []
+        owners = []  # (dosya index'i, frame id - görseller için None)
+        
+        def caption_pending(count: int):
+            """İlk count görseli caption'la, caption'ları sahip dosyalara geri dağıt"""
+            chunk_owners = owners[:count]
+            try:
+                captions = generate_captions(images[:count])
+                error = None
+            except Exception as e:
+                captions = [None] * len(chunk_owners)
+                error = str(e)
+            del images[:count], owners[:count]
+            
+            for (idx, frame_id), caption in zip(chunk_owners, captions):
+                if frame_id is None:
+                    if error is None:
+                        results[idx] = {"type": "image", "caption": caption, "status": "success"}
+                    else:
+                        results[idx] = {"type": "image", "caption": f"Analysis failed: {error}", "status": "error"}
+                else:
+                    results[idx]["captions"].append({
+                        "frame": frame_id,
+                        "caption": caption if error is None else f"Error: {error}"
+                    })
+        
+        for idx, (file_path, mime_type) in enumerate(files):
+            results.append(None)
+            if mime_type.startswith("image/"):
+                try:
+                    images.append(load_image(file_path))
+                    owners.append((idx, None))
+                except Exception as e:
+                    results[idx] = {"type": "image", "caption": f"Analysis failed: {str(e)}", "status": "error"}
+            elif mime_type.startswith("video/"):
+                try:
+                    frames, frame_ids, total_frames = sample_video_frames(file_path)
+                    images.extend(frames)
+                    owners.extend((idx, frame_id) for frame_id in frame_ids)
+                    results[idx] = {
+                        "type": "video",
+                        "captions": [],
+                        "total_frames": total_frames,
+                        "status": "success"
+                    }
+                except Exception as e:
+                    results[idx] = {"type": "video", "error": f"Analysis failed: {str(e)}", "status": "error"}
+            else:
+                results[idx] = {"error": "Unsupported file type"}
+            
+            # Dolu BLIP_BATCH'leri hemen caption'la - kalan indirmeler bu sırada sürer
+            while len(images) >= BLIP_BATCH:
+                caption_pending(BLIP_BATCH)
+        
+        if images:
+            caption_pending(len(images))
+        
+        return results
+    
     def analyze_content_batch(self, analysis_results: List[Dict[str, Any]], 
                             keywords: List[str] = None, 
                             description: str = None) -> Dict[str, Any]:
@@ -64,8 +137,9 @@ class ContentAgent:
                 video_captions=video_captions
             )
             
-            # ASO keyword analizi
-            all_content_text = " ".join(visual_captions + video_captions)
+            # ASO keyword analizi - tekrarlayan frame caption'ları yerine kümelenmiş caption'lar
+            unique_video_captions = self.text_processor.dedup_by_embedding(video_captions)
+            all_content_text = " ".join(visual_captions + unique_video_captions)
             if description:
                 all_content_text += f" {description}"
             
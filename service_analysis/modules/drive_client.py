@@ -2,6 +2,7 @@ import os
 import logging
 import pickle
 import io
+import threading
 from typing import Optional, Dict, Any, List
 from googleapiclient.discovery import build
 from googleapiclient.http import MediaIoBaseDownload
@@ -11,10 +12,15 @@ from google.auth.transport.requests import Request
 logger = logging.getLogger(__name__)
 
 SCOPES = ["https://www.googleapis.com/auth/drive"]
+DOWNLOAD_CHUNK_SIZE = 16 * 1024 * 1024  # 16MB
+# Cache'lenmiş OAuth token'ı - yoksa ilk kimlik doğrulama tarayıcıda yapılır
+TOKEN_PATH = "token.pickle"
 
 class GoogleDriveClient:
     def __init__(self, root_folder_name: str = "SourceData"):
         self.root_folder_name = root_folder_name
+        self._local = threading.local()
+        self.creds = None
         self.service = self._authenticate()
         self.folder_id = self._find_root_folder()
         self.download_dir = os.getenv("DOWNLOAD_DIR", "./downloads")
@@ -22,8 +28,8 @@ class GoogleDriveClient:
 
     def _authenticate(self):
         creds = None
-        if os.path.exists("token.pickle"):
-            with open("token.pickle", "rb") as token:
+        if os.path.exists(TOKEN_PATH):
+            with open(TOKEN_PATH, "rb") as token:
                 creds = pickle.load(token)
 
         if not creds or not creds.valid:
@@ -34,16 +40,25 @@ class GoogleDriveClient:
                     "credentials/service-account1.json", SCOPES
                 )
                 creds = flow.run_local_server(port=0)
-            with open("token.pickle", "wb") as token:
+            with open(TOKEN_PATH, "wb") as token:
                 pickle.dump(creds, token)
 
+        self.creds = creds
         logger.info("✅ Google OAuth ile kimlik doğrulama başarılı")
         return build("drive", "v3", credentials=creds)
 
+    def _thread_service(self):
+        """Thread'e özel Drive servisi - httplib2 bağlantıları thread-safe değil"""
+        service = getattr(self._local, "service", None)
+        if service is None:
+            service = build("drive", "v3", credentials=self.creds)
+            self._local.service = service
+        return service
+
     def _find_root_folder(self) -> Optional[str]:
         """SourceData klasörünü bulur, ID döner"""
         query = f"name='{self.root_folder_name}' and mimeType='application/vnd.google-apps.folder' and trashed=false"
-        results = self.service.files().list(q=query, fields="files(id, name)").execute()
+        results = self._thread_service().files().list(q=query, fields="files(id, name)").execute()
         items = results.get("files", [])
 
         if items:
@@ -68,7 +83,7 @@ class GoogleDriveClient:
             mime_query = " or ".join([f"mimeType='{m}'" for m in mime_types])
             query += f" and ({mime_query})"
         
-        results = self.service.files().list(
+        results = self._thread_service().files().list(
             q=query, 
             fields="files(id, name, mimeType, size, createdTime)"
         ).execute()
@@ -77,13 +92,19 @@ class GoogleDriveClient:
         logger.info(f"📋 {len(files)} dosya bulundu")
         return files
 
-    def download_file(self, file_id: str, file_name: str) -> str:
-        """Dosyayı indirir ve local path döner"""
-        request = self.service.files().get_media(fileId=file_id)
+    def download_file(self, file_id: str, file_name: str, expected_size: Optional[str] = None) -> str:
+        """Dosyayı indirir ve local path döner - aynı boyutta local kopya varsa indirmez"""
         file_path = os.path.join(self.download_dir, file_name)
 
+        if expected_size is not None and os.path.exists(file_path) \
+                and os.path.getsize(file_path) == int(expected_size):
+            logger.info(f"♻️ Dosya zaten mevcut, indirme atlandı: {file_name}")
+            return file_path
+
+        request = self._thread_service().files().get_media(fileId=file_id)
+
         with io.FileIO(file_path, "wb") as fh:
-            downloader = MediaIoBaseDownload(fh, request)
+            downloader = MediaIoBaseDownload(fh, request, chunksize=DOWNLOAD_CHUNK_SIZE)
             done = False
             while not done:
                 status, done = downloader.next_chunk()
@@ -95,7 +116,7 @@ class GoogleDriveClient:
 
     def get_file_info(self, file_id: str) -> Dict[str, Any]:
         """Dosya bilgilerini getirir"""
-        file_info = self.service.files().get(
+        file_info = self._thread_service().files().get(
             fileId=file_id,
             fields="id, name, mimeType, size, createdTime, webViewLink, webContentLink"
         ).execute()
@@ -117,7 +138,7 @@ class GoogleDriveClient:
             mime_query = " or ".join([f"mimeType='{m}'" for m in mime_types])
             search_query += f" and ({mime_query})"
         
-        results = self.service.files().list(
+        results = self._thread_service().files().list(
             q=search_query,
             fields="files(id, name, mimeType, parents)"
         ).execute()
@@ -127,9 +148,12 @@ class GoogleDriveClient:
 
 # Singleton instance
 _drive_client = None
+_drive_client_lock = threading.Lock()
 
 def get_drive_client() -> GoogleDriveClient:
     global _drive_client
     if _drive_client is None:
-        _drive_client = GoogleDriveClient()
+        with _drive_client_lock:
+            if _drive_client is None:
+                _drive_client = GoogleDriveClient()
     return _drive_client
@@ -1,12 +1,17 @@
 from fastapi import APIRouter, Query, HTTPException
-from typing import List, Optional
+from typing import List, Optional, Dict, Any
 from pydantic import BaseModel
+from concurrent.futures import ThreadPoolExecutor
+import asyncio
+import os
 from modules.content_agent import ContentAgent
 from modules.drive_client import get_drive_client
 
 router = APIRouter(prefix="/analyzes", tags=["Analyzes"])
 agent = ContentAgent()
 
+DOWNLOAD_WORKERS = int(os.getenv("DRIVE_DOWNLOAD_WORKERS", 8))
+
 # Request models
 class ContentAnalysisRequest(BaseModel):
     keywords: Optional[List[str]] = None
@@ -17,6 +22,47 @@ class TextAnalysisRequest(BaseModel):
     description: Optional[str] = ""
     keywords: Optional[List[str]] = None
 
+def _download_and_analyze_many(drive_client, files: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    """
+    Paralel indirmeleri analyze_many'ye sırayla biten dosyalar olarak besler: BLIP batch'leri
+    kalan indirmeler sürerken çalışır. files ile aynı sırada analiz listesi döner.
+    """
+    with ThreadPoolExecutor(max_workers=DOWNLOAD_WORKERS) as executor:
+        futures = [
+            executor.submit(drive_client.download_file, f["id"], f["name"], expected_size=f.get("size"))
+            for f in files
+        ]
+        return agent.analyze_many(
+            (future.result(), f["mimeType"]) for f, future in zip(files, futures)
+        )
+
+def _download_and_analyze(drive_client, files: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    """
+    İndirme ve analizi üst üste bindirir: indirmeler paralel thread'lerde sürerken
+    tek inference worker'ı (GPU) dosyaları sırayla analiz eder.
+    """
+    with ThreadPoolExecutor(max_workers=DOWNLOAD_WORKERS) as executor:
+        futures = [
+            executor.submit(drive_client.download_file, f["id"], f["name"], expected_size=f.get("size"))
+            for f in files
+        ]
+
+        results = []
+        for f, future in zip(files, futures):
+            file_path = future.result()
+            try:
+                analysis = agent.analyze(file_path, f["mimeType"])
+            except Exception as e:
+                analysis = {"status": "error", "message": str(e)}
+
+            results.append({
+                "file": f["name"],
+                "file_id": f["id"],
+                "mime_type": f["mimeType"],
+                "analysis": analysis
+            })
+        return results
+
 @router.get("/drive")
 async def analyze_drive(
     folder_id: Optional[str] = Query(None, description="Klasör ID (boş bırakılırsa SourceData klasörü kullanılır)")
@@ -28,25 +74,12 @@ async def analyze_drive(
                   "video/mp4", "video/avi", "video/quicktime"]  # mov yerine quicktime
     
     try:
-        files = drive_client.list_files(folder_id=folder_id, mime_types=mime_types)
+        files = await asyncio.to_thread(drive_client.list_files, folder_id=folder_id, mime_types=mime_types)
         
         if not files:
             return {"results": [], "total_files": 0, "message": "Klasörde analiz edilebilir dosya bulunamadı"}
 
-        results = []
-        for f in files:
-            file_path = drive_client.download_file(f["id"], f["name"])
-            try:
-                analysis = agent.analyze(file_path, f["mimeType"])
-            except Exception as e:
-                analysis = {"status": "error", "message": str(e)}
-            
-            results.append({
-                "file": f["name"], 
-                "file_id": f["id"],
-                "mime_type": f["mimeType"],
-                "analysis": analysis
-            })
+        results = await asyncio.to_thread(_download_and_analyze, drive_client, files)
         
         return {"results": results, "total_files": len(results), "status": "success"}
         
@@ -62,7 +95,7 @@ async def drive_test():
     
     try:
         # SourceData klasörünü bul veya ana dizindeki dosyaları listele
-        files = drive_client.list_files()
+        files = await asyncio.to_thread(drive_client.list_files)
         return {
             "success": True,
             "connection": "OK",
@@ -89,7 +122,7 @@ async def analyze_drive_enhanced(
     mime_types = ["image/jpeg", "image/png", "image/jpg", "video/mp4", "video/avi", "video/mov"]
     
     try:
-        files = drive_client.list_files(folder_id=folder_id, mime_types=mime_types)
+        files = await asyncio.to_thread(drive_client.list_files, folder_id=folder_id, mime_types=mime_types)
         
         if not files:
             return {
@@ -99,20 +132,22 @@ async def analyze_drive_enhanced(
                 "message": "Klasörde analiz edilebilir dosya bulunamadı"
             }
 
-        # Dosyaları analiz et
-        analysis_results = []
-        for f in files:
-            file_path = drive_client.download_file(f["id"], f["name"])
-            analysis = agent.analyze(file_path, f["mimeType"])
-            analysis_results.append({
-                "file": f["name"], 
+        # İndirilen dosyalar tamamlandıkça tek batch'li BLIP akışında analiz edilir
+        analyses = await asyncio.to_thread(_download_and_analyze_many, drive_client, files)
+        
+        analysis_results = [
+            {
+                "file": f["name"],
                 "file_id": f["id"],
                 "mime_type": f["mimeType"],
                 "analysis": analysis
-            })
+            }
+            for f, analysis in zip(files, analyses)
+        ]
         
         # Toplu analiz .
-        enhanced_analysis = agent.analyze_content_batch(
+        enhanced_analysis = await asyncio.to_thread(
+            agent.analyze_content_batch,
             analysis_results=analysis_results,
             keywords=request.keywords,
             description=request.description
@@ -129,7 +164,8 @@ async def analyze_text_keywords(request: TextAnalysisRequest):
     Sadece metin içeriği için ASO keyword analizi
     """
     try:
-        result = agent.analyze_text_content(
+        result = await asyncio.to_thread(
+            agent.analyze_text_content,
             title=request.title,
             description=request.description,
             keywords=request.keywords
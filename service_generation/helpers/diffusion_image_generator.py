@@ -1,8 +1,13 @@
 import os
+import queue
+import inspect
+import threading
+import time
 import uuid
-from datetime import datetime
+from concurrent.futures import Future
 from typing import Dict, Any, List, Optional
 import logging
+import numpy as np
 from dotenv import load_dotenv
 
 # PIL import (always needed)
@@ -10,25 +15,219 @@ from PIL import Image
 
 # Stable Diffusion imports (optional)
 try:
-    from diffusers import StableDiffusionPipeline
+    from diffusers import StableDiffusionPipeline, DPMSolverMultistepScheduler
     import torch
+    from diffusers.models.unet_2d_condition import UNet2DConditionOutput
+    try:
+        from diffusers import LCMScheduler
+    except ImportError:
+        LCMScheduler = None
+    try:
+        from diffusers import AutoencoderTiny
+    except ImportError:
+        AutoencoderTiny = None
+    try:
+        from diffusers.models.attention_processor import AttnProcessor2_0
+    except ImportError:
+        AttnProcessor2_0 = None
+    try:
+        from torchvision.io import write_png
+    except ImportError:
+        write_png = None
     DIFFUSION_AVAILABLE = True
     print("✅ Stable Diffusion kütüphaneleri yüklendi")
 except ImportError as e:
     print(f"❌ Stable Diffusion not available: {e}")
     StableDiffusionPipeline = None
+    DPMSolverMultistepScheduler = None
+    LCMScheduler = None
+    AutoencoderTiny = None
+    AttnProcessor2_0 = None
+    write_png = None
     torch = None
     DIFFUSION_AVAILABLE = False
 
+# 8-bit weight quantization (optional)
+try:
+    from optimum.quanto import quantize, freeze, qint8
+    QUANTO_AVAILABLE = True
+except ImportError:
+    quantize = freeze = qint8 = None
+    QUANTO_AVAILABLE = False
+
 load_dotenv()
 logger = logging.getLogger(__name__)
+# Request başına debug logları - format maliyeti sadece DEBUG açıksa ödenir
+_dbg = logger.debug
+
+DEFAULT_MODEL_ID = "runwayml/stable-diffusion-v1-5"
+NEGATIVE_PROMPT = "blurry, low quality, distorted, ugly"
+
+# Eşzamanlı istekleri tek pipeline çağrısında birleştirme (micro-batching)
+# Varsayılan 4; SD_MAX_BATCH verilmemişse _configure_memory düşük VRAM'de düşürür
+# (CFG ile UNet batch'i 2x - slicing tier'ında 8'lik UNet batch'i OOM riski)
+MAX_BATCH = int(os.getenv("SD_MAX_BATCH", 4))
+MAX_BATCH_FROM_ENV = "SD_MAX_BATCH" in os.environ
+BATCH_WINDOW = float(os.getenv("SD_BATCH_WINDOW", 0.02))
+LCM_LORA_ID = "latent-consistency/lcm-lora-sdv1-5"
+TINY_VAE_ID = "madebyollin/taesd"
+
+class _CUDAGraphUNet:
+    """
+    UNet forward'unu CUDA Graph olarak yakalayıp her denoising adımında replay eder.
+    Her input shape'i (ör. micro-batch boyutu) için graph warmup'ta bir kez yakalanır;
+    tüm graph'lar tek memory pool'u paylaşır. freeze() sonrası yeni shape yakalanmaz,
+    eager çalışır - global capture aynı anda çalışan diğer thread'lerin CUDA çağrılarını
+    bozar. torch.compile olmayan ortamlar için.
+    """
+    
+    def __init__(self, unet):
+        self.unet = unet
+        self._graphs = {}
+        self._disabled = False
+        self._frozen = False
+        # Graph'lar batcher thread'inde sırayla replay edilir, çıktı hemen kopyalanır -
+        # ortak pool güvenli ve her shape için ayrı pool'dan çok daha az VRAM tutar
+        self._pool = torch.cuda.graph_pool_handle()
+    
+    def freeze(self):
+        """Warmup bitti - bundan sonra gelen yakalanmamış shape'ler eager çalışır"""
+        self._frozen = True
+    
+    def __getattr__(self, name):
+        # config, dtype, device vb. orijinal UNet'ten gelsin
+        return getattr(self.unet, name)
+    
+    def __call__(self, sample, timestep, encoder_hidden_states, return_dict=True, **kwargs):
+        if self._disabled or any(v is not None for v in kwargs.values()):
+            return self.unet(sample, timestep, encoder_hidden_states=encoder_hidden_states,
+                             return_dict=return_dict, **kwargs)
+        
+        timestep = torch.as_tensor(timestep, device=sample.device)
+        key = (sample.shape, sample.dtype, timestep.shape, encoder_hidden_states.shape)
+        entry = self._graphs.get(key)
+        if entry is None and self._frozen:
+            return self.unet(sample, timestep, encoder_hidden_states=encoder_hidden_states,
+                             return_dict=return_dict)
+        if entry is None:
+            try:
+                entry = self._graphs[key] = self._capture(sample, timestep, encoder_hidden_states)
+            except Exception as e:
+                # Yakalanamayan graph'ta kalıcı olarak eager mode'a dön
+                logger.warning(f"CUDA Graph capture failed, using eager UNet: {e}")
+                self._disabled = True
+                self._graphs.clear()
+                return self.unet(sample, timestep, encoder_hidden_states=encoder_hidden_states,
+                                 return_dict=return_dict)
+        
+        graph, static_sample, static_timestep, static_hidden, static_out = entry
+        static_sample.copy_(sample)
+        static_timestep.copy_(timestep)
+        static_hidden.copy_(encoder_hidden_states)
+        graph.replay()
+        
+        out = static_out.clone()
+        return UNet2DConditionOutput(sample=out) if return_dict else (out,)
+    
+    def _capture(self, sample, timestep, encoder_hidden_states):
+        static_sample = sample.clone()
+        static_timestep = timestep.clone()
+        static_hidden = encoder_hidden_states.clone()
+        
+        # Capture öncesi yan stream'de warmup
+        stream = torch.cuda.Stream()
+        stream.wait_stream(torch.cuda.current_stream())
+        with torch.cuda.stream(stream):
+            for _ in range(3):
+                self.unet(static_sample, static_timestep, encoder_hidden_states=static_hidden)
+        torch.cuda.current_stream().wait_stream(stream)
+        
+        graph = torch.cuda.CUDAGraph()
+        with torch.cuda.graph(graph, pool=self._pool):
+            static_out = self.unet(static_sample, static_timestep,
+                                   encoder_hidden_states=static_hidden).sample
+        return graph, static_sample, static_timestep, static_hidden, static_out
 
 class DiffusionImageGenerator:
-    def __init__(self):
+    # Style'a göre base prompt'lar
+    _STYLE_PROMPTS = {
+        "modern": "modern digital art, clean design, professional layout,",
+        "gaming": "gaming art, neon colors, futuristic design, digital illustration,",
+        "minimal": "minimalist art, simple design, clean composition,",
+        "trendy": "trendy digital art, vibrant colors, social media style,"
+    }
+    
+    # Quality modifiers
+    _QUALITY_SUFFIX = ", high quality, detailed, professional, digital art, 4k, instagram ready"
+    
+    def __init__(self, fast_vae: Optional[bool] = None):
         self.pipe = None
         self.device = "cuda" if (torch and torch.cuda.is_available()) else "cpu"
         self.poster_size = (1080, 1080)
-        self._setup_pipeline()
+        # DPM-Solver++ ve distilled modellerde (turbo / LCM) _setup_pipeline tarafından düşürülür
+        self.num_inference_steps = 20
+        # Micro-batch üst sınırı - _configure_memory VRAM tier'ına göre düşürebilir
+        self.max_batch = MAX_BATCH
+        self.guidance_scale = 7.5
+        # "sdpa", "xformers" veya "default" - _configure_attention belirler
+        self.attention_backend = "default"
+        # Düşük gecikme modu: VAE yerine TAESD tiny decoder (SD_FAST_VAE=1)
+        self.fast_vae = os.getenv("SD_FAST_VAE") == "1" if fast_vae is None else fast_vae
+        # CUDA'da VAE decode + resize + PNG tensor'ü GPU'da kalır, PIL'e hiç dönülmez
+        self.gpu_postprocess = self.device == "cuda" and write_png is not None
+        # tmp directory - bir kez oluşturulur, her kayıtta makedirs yok
+        self._tmp_dir = os.path.abspath(os.path.join(os.path.dirname(__file__), "..", "tmp"))
+        os.makedirs(self._tmp_dir, exist_ok=True)
+        # Yeniden kullanılan 1080x1080 canvas'lar (thread başına) ve sabit fallback image
+        self._scratch = threading.local()
+        self._fallback_image = None
+        # Pipeline kurulumu ağır (model indirme + compile) - ensure_ready() ile yapılır
+        self._ready = threading.Event()
+        self._ready_lock = threading.Lock()
+        # (prompt, output_type, Future) kuyruğu - _batch_loop thread'i tüketir
+        self._requests = queue.Queue()
+    
+    def ensure_ready(self):
+        """Pipeline'ı bir kez kur ve ısıt; eşzamanlı çağrılar kurulum bitene kadar bekler"""
+        if self._ready.is_set():
+            return
+        with self._ready_lock:
+            if not self._ready.is_set():
+                self._setup_pipeline()
+                self._warmup()
+                if self.pipe is not None:
+                    threading.Thread(target=self._batch_loop, name="diffusion-batcher", daemon=True).start()
+                self._ready.set()
+    
+    def _warmup(self):
+        """
+        Dummy generation ile cuDNN benchmark, CUDA Graph capture ve compile warmup'ını
+        ilk istekten önce tetikle. reduce-overhead mode graph'ı ikinci çağrıda yakalar.
+        CUDA Graph wrapper'ında 1..max_batch her micro-batch boyutu burada yakalanır.
+        """
+        if self.pipe is None:
+            return
+        
+        graph_unet = self.pipe.unet if isinstance(self.pipe.unet, _CUDAGraphUNet) else None
+        batch_sizes = range(1, self.max_batch + 1) if graph_unet is not None else (1,)
+        
+        try:
+            print(f"🔥 [SETUP] Pipeline warmup...")
+            with torch.inference_mode():
+                for batch_size in batch_sizes:
+                    # _run_batch ile aynı shape'ler (negative prompt dahil)
+                    for _ in range(1 if graph_unet is not None else 2):
+                        self.pipe(["warmup"] * batch_size,
+                                  negative_prompt=[NEGATIVE_PROMPT] * batch_size,
+                                  height=512, width=512, num_inference_steps=2,
+                                  guidance_scale=self.guidance_scale)
+            print(f"✅ [SETUP] Warmup tamamlandı")
+        except Exception as e:
+            print(f"⚠️ [SETUP] Warmup başarısız: {e}")
+            logger.warning(f"Pipeline warmup failed: {e}")
+        finally:
+            if graph_unet is not None:
+                graph_unet.freeze()
         
     def _setup_pipeline(self):
         """Stable Diffusion pipeline kurulumu"""
@@ -51,20 +250,66 @@ class DiffusionImageGenerator:
                 print(f"⚠️ [SETUP] CUDA not available, using CPU (slower)")
             
             # Model yükleme
-            model_id = "runwayml/stable-diffusion-v1-5"
+            model_id = os.getenv("SD_MODEL_ID", DEFAULT_MODEL_ID)
             print(f"📥 [SETUP] Loading model: {model_id}")
             print(f"⏳ [SETUP] İlk yüklemede birkaç dakika sürebilir...")
             
             # Pipeline kurulum
             self.pipe = StableDiffusionPipeline.from_pretrained(
                 model_id, 
-                torch_dtype=torch.float16 if self.device == "cuda" else torch.float32,
+                torch_dtype=self._select_dtype(),
                 safety_checker=None,
                 requires_safety_checker=False
             )
             
+            if self.fast_vae:
+                self._use_tiny_vae()
+            
+            # DPM-Solver++ 2M Karras: PNDM'nin 20 adımlık kalitesine ~10 adımda ulaşır.
+            # use_karras_sigmas diffusers 0.17+'da var (pin'lenmiş 0.15.1'de yok, from_config
+            # sessizce yok sayar) - Karras sigma'ları olmadan DPM-Solver++ 20 adımda kalır
+            if os.getenv("SD_DPM_SOLVER", "1") == "1" and "turbo" not in model_id.lower():
+                karras = "use_karras_sigmas" in inspect.signature(DPMSolverMultistepScheduler.__init__).parameters
+                scheduler_kwargs = {"use_karras_sigmas": True} if karras else {}
+                self.pipe.scheduler = DPMSolverMultistepScheduler.from_config(
+                    self.pipe.scheduler.config,
+                    algorithm_type="dpmsolver++",
+                    **scheduler_kwargs
+                )
+                self.num_inference_steps = 10 if karras else 20
+                print(f"⚡ [SETUP] DPM-Solver++ scheduler: {self.num_inference_steps} steps")
+            
+            # Distilled modeller scheduler'ı ve adım sayısını kendisi belirler
+            self._configure_distillation(model_id)
+            
+            if os.getenv("SD_QUANT") == "int8":
+                self._quantize_weights()
+            
             # Device'a taşı
             self.pipe = self.pipe.to(self.device)
+            self.pipe.set_progress_bar_config(disable=True)
+            
+            if self.device == "cuda":
+                torch.backends.cudnn.benchmark = True
+                torch.backends.cuda.matmul.allow_tf32 = True
+                if hasattr(torch, "set_float32_matmul_precision"):
+                    torch.set_float32_matmul_precision("high")
+                
+                # NHWC - cuDNN Tensor Core conv kernel'leri
+                self.pipe.unet.to(memory_format=torch.channels_last)
+                self.pipe.vae.to(memory_format=torch.channels_last)
+                
+                self._configure_attention()
+            
+            offloaded = self._configure_memory()
+            
+            if self.device == "cuda" and not offloaded:
+                self._compile_unet()
+                
+                # torch.compile yoksa denoising adımlarını CUDA Graph ile replay et
+                if not hasattr(self.pipe.unet, "_orig_mod") and os.getenv("SD_CUDA_GRAPH", "1") == "1":
+                    self.pipe.unet = _CUDAGraphUNet(self.pipe.unet)
+                    print(f"⚡ [SETUP] UNet CUDA Graph replay enabled")
             
             print(f"✅ [SETUP] Pipeline başarıyla kuruldu!")
             logger.info(f"Stable Diffusion pipeline ready on {self.device}")
@@ -74,6 +319,143 @@ class DiffusionImageGenerator:
             logger.error(f"Pipeline setup failed: {e}")
             self.pipe = None
     
+    def _use_tiny_vae(self):
+        """VAE'yi TAESD ile değiştir - decode 30-100x hızlı, sosyal medya görselinde fark ihmal edilebilir"""
+        if AutoencoderTiny is None:
+            print("⚠️ [SETUP] SD_FAST_VAE için diffusers>=0.19 gerekli (AutoencoderTiny), tam VAE kullanılıyor")
+            return
+        
+        self.pipe.vae = AutoencoderTiny.from_pretrained(TINY_VAE_ID, torch_dtype=self.pipe.unet.dtype)
+        print(f"⚡ [SETUP] Tiny VAE (TAESD) enabled")
+    
+    def _configure_distillation(self, model_id: str):
+        """Distilled modeller için adım sayısını düşür: turbo modeller veya SD1.5 + LCM-LoRA (SD_LCM_LORA=1)"""
+        if "turbo" in model_id.lower():
+            # Turbo modeller CFG olmadan 1-4 adımda çalışır
+            self.num_inference_steps = 4
+            self.guidance_scale = 0.0
+            print(f"⚡ [SETUP] Distilled turbo model: {self.num_inference_steps} steps, CFG off")
+        elif os.getenv("SD_LCM_LORA") == "1":
+            if LCMScheduler is None:
+                print(f"⚠️ [SETUP] SD_LCM_LORA için diffusers>=0.22 gerekli, {self.num_inference_steps} step ile devam")
+                return
+            self.pipe.load_lora_weights(LCM_LORA_ID)
+            self.pipe.fuse_lora()
+            self.pipe.scheduler = LCMScheduler.from_config(self.pipe.scheduler.config)
+            self.num_inference_steps = 4
+            self.guidance_scale = 1.0
+            print(f"⚡ [SETUP] LCM-LoRA loaded: {self.num_inference_steps} steps")
+    
+    def _quantize_weights(self):
+        """
+        UNet ve VAE ağırlıklarını int8'e quantize et (SD_QUANT=int8).
+        FP16 UNet ~1.7 GB -> ~0.9 GB; bellek-bant genişliğine bağlı adımlar hızlanır.
+        """
+        if not QUANTO_AVAILABLE:
+            print("⚠️ [SETUP] SD_QUANT=int8 için optimum-quanto gerekli: pip install optimum-quanto")
+            return
+        
+        for module in (self.pipe.unet, self.pipe.vae):
+            quantize(module, weights=qint8)
+            freeze(module)
+        print(f"🗜️ [SETUP] UNet/VAE weights quantized to int8")
+    
+    def _configure_attention(self):
+        """
+        PyTorch 2.0+ SDPA attention (FlashAttention / mem-efficient backend);
+        torch<2'de xformers memory-efficient attention, o da yoksa varsayılan dense attention.
+        """
+        if AttnProcessor2_0 is not None and hasattr(torch.nn.functional, "scaled_dot_product_attention"):
+            self.pipe.unet.set_attn_processor(AttnProcessor2_0())
+            self.attention_backend = "sdpa"
+        else:
+            try:
+                self.pipe.enable_xformers_memory_efficient_attention()
+                self.attention_backend = "xformers"
+            except Exception as e:
+                logger.info(f"xformers not available: {e}")
+        
+        print(f"⚡ [SETUP] Attention backend: {self.attention_backend}")
+    
+    def _configure_memory(self) -> bool:
+        """
+        CPU / düşük VRAM için attention + VAE slicing, çok düşük VRAM'de sequential CPU offload.
+        8 GiB+ boş VRAM'de slicing'in senkronizasyon maliyetinden kaçınılır.
+        Returns: pipeline CPU offload'a alındıysa True
+        """
+        gib = 1024 ** 3
+        free_memory = torch.cuda.mem_get_info()[0] if self.device == "cuda" else 0
+        
+        if self.device == "cuda" and free_memory < 6 * gib:
+            # Offload hook'ları modülleri kendisi taşır - önce CPU'ya al
+            self.pipe = self.pipe.to("cpu")
+            self.pipe.enable_sequential_cpu_offload()
+            self.pipe.enable_vae_slicing()
+            if not MAX_BATCH_FROM_ENV:
+                self.max_batch = 1
+            print(f"💾 [SETUP] Low VRAM ({free_memory / gib:.1f} GiB free): sequential CPU offload enabled")
+            return True
+        
+        if self.device == "cpu" or free_memory < 8 * gib:
+            # SDPA / xformers zaten bellek-verimli; yoksa attention'ı dilimle
+            if self.attention_backend == "default":
+                self.pipe.enable_attention_slicing("max")
+            self.pipe.enable_vae_slicing()
+            if not MAX_BATCH_FROM_ENV:
+                self.max_batch = min(self.max_batch, 2)
+            print(f"💾 [SETUP] Attention/VAE slicing enabled, max batch {self.max_batch}")
+        
+        return False
+    
+    def _compile_unet(self):
+        """UNet'i torch.compile ile derle, Inductor cache'ini tmp altında sakla (PyTorch 2.0+)"""
+        
+        if not hasattr(torch, "compile") or os.getenv("SD_COMPILE", "1") != "1":
+            return
+        
+        try:
+            # Worker'lar / süreçler arası paylaşılan cache (SD_INDUCTOR_CACHE_DIR), GPU mimarisine göre ayrı
+            base_dir = os.getenv("SD_INDUCTOR_CACHE_DIR",
+                                 os.path.join(os.path.dirname(__file__), "..", "tmp", "inductor"))
+            major, minor = torch.cuda.get_device_capability()
+            cache_dir = os.path.join(base_dir, f"sm{major}{minor}")
+            os.makedirs(cache_dir, exist_ok=True)
+            os.environ.setdefault("TORCHINDUCTOR_CACHE_DIR", cache_dir)
+            artifacts_path = os.path.join(cache_dir, "sd15-v1_512.bin")
+            
+            # Önceki çalıştırmanın derleme artifact'lerini yükle (PyTorch 2.7+)
+            compiler = getattr(torch, "compiler", None)
+            can_cache = hasattr(compiler, "load_cache_artifacts")
+            if can_cache and os.path.exists(artifacts_path):
+                with open(artifacts_path, "rb") as f:
+                    compiler.load_cache_artifacts(f.read())
+            
+            self.pipe.unet = torch.compile(self.pipe.unet, mode="reduce-overhead", fullgraph=True)
+            
+            # Warmup - derleme ilk istekte değil burada yapılsın
+            self.pipe("warmup", height=512, width=512, num_inference_steps=1)
+            
+            if can_cache:
+                artifacts = compiler.save_cache_artifacts()
+                if artifacts is not None:
+                    with open(artifacts_path, "wb") as f:
+                        f.write(artifacts[0])
+            
+            print(f"⚡ [SETUP] UNet torch.compile ile derlendi")
+            
+        except Exception as e:
+            print(f"⚠️ [SETUP] torch.compile başarısız, eager mode kullanılıyor: {e}")
+            if hasattr(self.pipe.unet, "_orig_mod"):
+                self.pipe.unet = self.pipe.unet._orig_mod
+    
+    def _select_dtype(self):
+        """CUDA'da Ampere+ için BF16, eski GPU'larda FP16, CPU'da FP32"""
+        if self.device != "cuda":
+            return torch.float32
+        if torch.cuda.get_device_capability()[0] >= 8:
+            return torch.bfloat16
+        return torch.float16
+    
     def generate_instagram_image(self, 
                                 content_data: Dict[str, Any],
                                 trend_data: Optional[Dict[str, Any]] = None,
@@ -82,46 +464,44 @@ class DiffusionImageGenerator:
         Diğer servislerden gelen bilgilerle Instagram image üret
         """
         try:
-            print(f"\n🎨 [GENERATION] Instagram image generation başlıyor...")
-            print(f"🎨 [GENERATION] Style: {style}")
-            print(f"🤖 [GENERATION] Pipeline ready: {self.pipe is not None}")
-            
-            # Input data debug
-            print(f"\n📋 [INPUT] Content Data:")
-            print(f"   • Visual Summary: {content_data.get('visual_summary', 'N/A')}")
-            print(f"   • Keywords: {content_data.get('keywords', [])}")
-            print(f"   • Hashtags: {content_data.get('hashtags', [])}")
-            
-            if trend_data:
-                print(f"📈 [INPUT] Trend Data:")
-                print(f"   • Trends: {trend_data.get('trends', [])}")
+            start_time = time.perf_counter()
+            self.ensure_ready()
+            if logger.isEnabledFor(logging.DEBUG):
+                _dbg("🎨 [GENERATION] Style: %s, pipeline ready: %s", style, self.pipe is not None)
+                _dbg("📋 [INPUT] Visual summary: %s", content_data.get('visual_summary', 'N/A'))
+                _dbg("📋 [INPUT] Keywords: %s, hashtags: %s",
+                     content_data.get('keywords', []), content_data.get('hashtags', []))
+                if trend_data:
+                    _dbg("📈 [INPUT] Trends: %s", trend_data.get('trends', []))
             
             # Prompt oluştur
             prompt = self._create_prompt_from_services(content_data, trend_data, style)
             
             if self.pipe:
-                print(f"\n🤖 [AI] Stable Diffusion ile görsel üretiliyor...")
-                print(f"📝 [AI] Prompt: {prompt}")
-                
-                # Stable Diffusion ile üret
-                image = self._generate_with_stable_diffusion(prompt)
-                
-                # Instagram formatına dönüştür
-                instagram_image = self._resize_for_instagram(image)
+                if self.gpu_postprocess:
+                    # Latent -> Instagram canvas tamamen GPU'da, tek D2H kopya
+                    latents = self._generate_with_stable_diffusion(prompt, output_type="latent")
+                    instagram_image = self._format_on_gpu(latents)
+                else:
+                    # Stable Diffusion ile üret
+                    image = self._generate_with_stable_diffusion(prompt)
+                    
+                    # Instagram formatına dönüştür
+                    instagram_image = self._resize_for_instagram(image)
                 
             else:
-                print(f"⚠️ [FALLBACK] Pipeline yok, fallback image oluşturuluyor...")
+                logger.warning("⚠️ [FALLBACK] Pipeline yok, fallback image oluşturuluyor")
                 instagram_image = self._create_fallback_image(content_data, style)
             
             # Kaydet
             saved_path = self._save_image(instagram_image, f"{style}_generated")
             
-            print(f"🎉 [SUCCESS] Generation tamamlandı: {saved_path}")
+            logger.info("🎉 [SUCCESS] Generation tamamlandı: %s (%.2f saniye)",
+                        saved_path, time.perf_counter() - start_time)
             return saved_path
             
         except Exception as e:
-            print(f"❌ [ERROR] Generation başarısız: {e}")
-            logger.error(f"Image generation failed: {e}")
+            logger.error("❌ [ERROR] Generation başarısız: %s", e)
             return self._create_fallback_image(content_data, style)
     
     def _create_prompt_from_services(self, content_data: Dict[str, Any], 
@@ -129,164 +509,215 @@ class DiffusionImageGenerator:
                                    style: str) -> str:
         """Diğer servislerden gelen bilgilere göre prompt oluştur"""
         
-        print(f"\n🔄 [PROMPT] Servis bilgilerinden prompt oluşturuluyor...")
-        
         # Analysis servisinden gelen bilgiler
         visual_summary = content_data.get('visual_summary', 'amazing content')
         keywords = content_data.get('keywords', [])
         hashtags = content_data.get('hashtags', [])
         
-        print(f"📊 [PROMPT] Visual summary: {visual_summary}")
-        print(f"📊 [PROMPT] Keywords: {keywords}")
-        
         # Trend servisinden gelen bilgiler
         trends = []
         if trend_data:
             trends = trend_data.get('trends', [])
-            print(f"📈 [PROMPT] Trends: {trends}")
         
         # Style'a göre base prompt
-        style_prompts = {
-            "modern": "modern digital art, clean design, professional layout,",
-            "gaming": "gaming art, neon colors, futuristic design, digital illustration,",
-            "minimal": "minimalist art, simple design, clean composition,",
-            "trendy": "trendy digital art, vibrant colors, social media style,"
-        }
-        
-        base_prompt = style_prompts.get(style, style_prompts["modern"])
+        base_prompt = self._STYLE_PROMPTS.get(style, self._STYLE_PROMPTS["modern"])
         
         # Ana içerik
         main_content = visual_summary
         
         # Keywords'i prompt'a ekle
         if keywords:
-            keywords_text = ", ".join(keywords[:5])
-            main_content += f", featuring {keywords_text}"
+            main_content += f", featuring {', '.join(keywords[:5])}"
         
         # Trends'i ekle
         if trends:
-            trends_text = ", ".join(trends[:3])
-            main_content += f", with {trends_text} elements"
-        
-        # Quality modifiers
-        quality_suffix = ", high quality, detailed, professional, digital art, 4k, instagram ready"
+            main_content += f", with {', '.join(trends[:3])} elements"
         
         # Final prompt
-        final_prompt = f"{base_prompt} {main_content}{quality_suffix}"
+        final_prompt = f"{base_prompt} {main_content}{self._QUALITY_SUFFIX}"
         
-        print(f"✨ [PROMPT] Final prompt oluşturuldu ({len(final_prompt)} karakter)")
-        print(f"📝 [PROMPT] Preview: {final_prompt[:100]}...")
+        _dbg("✨ [PROMPT] Final prompt (%d karakter): %s", len(final_prompt), final_prompt)
         
         return final_prompt
     
-    def _generate_with_stable_diffusion(self, prompt: str) -> Image.Image:
-        """Stable Diffusion ile görsel üret - tam sizin örneğiniz gibi"""
+    def _generate_with_stable_diffusion(self, prompt: str, output_type: str = "pil"):
+        """
+        Stable Diffusion ile görsel üret - output_type="latent" ile latent tensor döner.
+        İstek kuyruğa girer; eşzamanlı istekler _batch_loop'ta tek batch'te üretilir.
+        """
+        
+        future = Future()
+        self._requests.put((prompt, output_type, future))
+        return future.result()
+    
+    def _batch_loop(self):
+        """Kuyruktan BATCH_WINDOW içinde gelen max_batch'e kadar isteği topla ve birlikte üret"""
+        while True:
+            batch = [self._requests.get()]
+            deadline = time.monotonic() + BATCH_WINDOW
+            while len(batch) < self.max_batch:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                try:
+                    batch.append(self._requests.get(timeout=remaining))
+                except queue.Empty:
+                    break
+            
+            # Aynı output_type'lar tek pipeline çağrısında
+            groups = {}
+            for item in batch:
+                groups.setdefault(item[1], []).append(item)
+            for output_type, items in groups.items():
+                self._run_batch(items, output_type)
+    
+    def _run_batch(self, items, output_type: str):
+        """Bir grup isteği tek pipeline çağrısıyla üret, sonuçları future'lara dağıt"""
+        
+        prompts = [prompt for prompt, _, _ in items]
         
         try:
-            print(f"\n🤖 [DIFFUSION] Stable Diffusion generation başlıyor...")
-            print(f"📝 [DIFFUSION] Prompt: {prompt}")
-            print(f"🔧 [DIFFUSION] Device: {self.device}")
-            
-            # Generation parameters
-            generation_params = {
-                "prompt": prompt,
-                "height": 512,
-                "width": 512,
-                "num_inference_steps": 20,
-                "guidance_scale": 7.5,
-                "negative_prompt": "blurry, low quality, distorted, ugly"
-            }
-            
-            print(f"⚙️ [DIFFUSION] Parameters:")
-            for key, value in generation_params.items():
-                print(f"   • {key}: {value}")
+            _dbg("⏳ [DIFFUSION] Generating %d prompt(s) on %s (%d steps)",
+                 len(prompts), self.device, self.num_inference_steps)
             
-            print(f"⏳ [DIFFUSION] Generating... (20 steps)")
+            # Hot path'te senkronizasyon/zaman ölçümü yok - süre generate_instagram_image'da loglanır
+            with torch.inference_mode():
+                result = self.pipe(
+                    prompt=prompts,
+                    negative_prompt=[NEGATIVE_PROMPT] * len(prompts),
+                    height=512,
+                    width=512,
+                    num_inference_steps=self.num_inference_steps,
+                    guidance_scale=self.guidance_scale,
+                    output_type=output_type
+                )
             
-            # Sizin örneğinizin aynısı
-            import time
-            start_time = time.time()
-            
-            result = self.pipe(**generation_params)
-            image = result.images[0]  # İlk image'i al
-            
-            generation_time = time.time() - start_time
-            
-            print(f"✅ [DIFFUSION] Generation tamamlandı!")
-            print(f"⏱️ [DIFFUSION] Süre: {generation_time:.2f} saniye")
-            print(f"📏 [DIFFUSION] Image boyutu: {image.size}")
-            
-            return image
+            for i, (_, _, future) in enumerate(items):
+                # Latent'lerde batch boyutu korunur (1, 4, 64, 64)
+                image = result.images[i:i + 1] if output_type == "latent" else result.images[i]
+                future.set_result(image)
             
         except Exception as e:
-            print(f"❌ [DIFFUSION] Generation hatası: {e}")
-            raise
+            logger.error("❌ [DIFFUSION] Generation hatası: %s", e)
+            for _, _, future in items:
+                future.set_exception(e)
     
     def _resize_for_instagram(self, image: Image.Image) -> Image.Image:
-        """AI image'i Instagram formatına çevir"""
+        """
+        AI image'i Instagram formatına çevir. Thread başına tek 1080x1080 canvas yeniden
+        kullanılır; bilinear resize Instagram'ın JPEG sıkıştırmasından sonra LANCZOS'tan ayırt edilmez.
+        """
         
-        print(f"📱 [FORMAT] Instagram formatına çevriliyor...")
+        try:
+            import cv2  # lazy - sadece generation yolunda gerekli
+        except ImportError:
+            cv2 = None
         
-        # Instagram square format
-        instagram_img = Image.new('RGB', self.poster_size, color='white')
+        width, height = self.poster_size
+        x = (width - 900) // 2
+        y = (height - 900) // 2
         
-        # AI image'i resize et ve merkeze yerleştir
-        resized_image = image.resize((900, 900), Image.Resampling.LANCZOS)
+        if cv2 is not None:
+            resized = cv2.resize(np.asarray(image), (900, 900), interpolation=cv2.INTER_LINEAR)
+        else:
+            resized = np.asarray(image.resize((900, 900), Image.BILINEAR))
         
-        # Merkeze paste
-        x = (self.poster_size[0] - 900) // 2
-        y = (self.poster_size[1] - 900) // 2
+        # Eşzamanlı istekler aynı canvas'a yazmasın - her thread'in kendi canvas'ı
+        canvas = getattr(self._scratch, "canvas", None)
+        if canvas is None:
+            canvas = self._scratch.canvas = np.empty((height, width, 3), np.uint8)
+        canvas.fill(255)
+        canvas[y:y + 900, x:x + 900] = resized
         
-        instagram_img.paste(resized_image, (x, y))
+        # fromarray RGB veriyi kopyalar - canvas bir sonraki istekte güvenle yeniden kullanılır
+        return Image.fromarray(canvas)
+    
+    def _format_on_gpu(self, latents) -> "torch.Tensor":
+        """
+        Latent'i GPU'da decode et, 900x900 bicubic resize ve beyaz padding ile 1080x1080 yap.
+        Sonuç uint8 CHW CPU tensor - write_png'ye doğrudan verilir.
+        """
         
-        print(f"✅ [FORMAT] Instagram formatı hazır: {instagram_img.size}")
+        vae = self.pipe.vae
+        scaling_factor = getattr(vae.config, "scaling_factor", 0.18215)
         
-        return instagram_img
+        with torch.inference_mode():
+            image = vae.decode(latents / scaling_factor).sample
+            image = (image / 2 + 0.5).clamp(0, 1).float()
+            
+            # bicubic interpolate FP16/BF16'da her GPU'da desteklenmiyor - FP32'de yap
+            image = torch.nn.functional.interpolate(image, size=(900, 900), mode="bicubic", align_corners=False)
+            
+            width, height = self.poster_size
+            x = (width - 900) // 2
+            y = (height - 900) // 2
+            canvas = torch.nn.functional.pad(image, (x, width - 900 - x, y, height - 900 - y), value=1.0)
+            
+            # Tek D2H kopya: 1080x1080x3 uint8
+            canvas = canvas[0].clamp(0, 1).mul(255).round().to(torch.uint8).cpu()
+        
+        return canvas
     
     def _create_fallback_image(self, content_data: Dict[str, Any], style: str) -> str:
         """Fallback image oluştur"""
         
-        print(f"🔄 [FALLBACK] Fallback image oluşturuluyor...")
-        
-        # Basit renkli image
-        img = Image.new('RGB', self.poster_size, color='#3498DB')
+        # Basit renkli image - sabit içerik, bir kez oluşturulup sadece okunur
+        if self._fallback_image is None:
+            self._fallback_image = Image.new('RGB', self.poster_size, color='#3498DB')
         
-        return self._save_image(img, f"{style}_fallback")
+        return self._save_image(self._fallback_image, f"{style}_fallback")
     
-    def _save_image(self, img: Image.Image, prefix: str) -> str:
-        """Image'i tmp'ye kaydet"""
+    @staticmethod
+    def _write_png(img, filepath: str):
+        """PNG'yi önce .part dosyasına yaz, sonra rename et - download yarım dosya görmesin"""
+        part_path = f"{filepath}.part"
+        if isinstance(img, Image.Image):
+            # compress_level=1: varsayılan 6'ya göre ~3x hızlı encode, biraz daha büyük dosya
+            img.save(part_path, "PNG", optimize=False, compress_level=1)
+        else:
+            write_png(img, part_path, compression_level=1)
+        os.replace(part_path, filepath)
+    
+    def _save_image(self, img, prefix: str) -> str:
+        """Image'i tmp'ye kaydet - PIL Image veya GPU yolundan gelen uint8 CHW tensor"""
         
         try:
-            # tmp directory
-            tmp_dir = os.path.join(os.path.dirname(__file__), "..", "tmp")
-            os.makedirs(tmp_dir, exist_ok=True)
-            
             # Unique filename
-            timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-            unique_id = str(uuid.uuid4())[:8]
-            filename = f"{prefix}_{timestamp}_{unique_id}.png"
-            filepath = os.path.join(tmp_dir, filename)
+            filename = f"{prefix}_{time.time_ns()}_{uuid.uuid4().hex[:8]}.png"
+            filepath = os.path.join(self._tmp_dir, filename)
             
-            # Save
-            img.save(filepath, "PNG", quality=95)
+            size = img.size if isinstance(img, Image.Image) else (img.shape[2], img.shape[1])
             
-            print(f"💾 [SAVE] Kaydedildi: {filename}")
-            print(f"📁 [SAVE] Konum: {tmp_dir}")
-            print(f"📏 [SAVE] Boyut: {img.size}")
+            # Dönmeden önce yazılır - path'i alan quality/finalize adımları dosyayı hemen açar,
+            # yazma hatası da generate_instagram_image'da fallback'e düşer
+            self._write_png(img, filepath)
             
-            logger.info(f"Image saved: {filename}")
+            _dbg("💾 [SAVE] Kaydedildi: %s %s", filepath, size)
             
             return filepath
             
         except Exception as e:
-            print(f"❌ [SAVE] Kayıt hatası: {e}")
+            logger.error("❌ [SAVE] Kayıt hatası: %s", e)
             raise
 
 # Singleton
 _diffusion_generator = None
+_diffusion_lock = threading.Lock()
 
 def get_diffusion_generator() -> DiffusionImageGenerator:
     global _diffusion_generator
     if _diffusion_generator is None:
-        _diffusion_generator = DiffusionImageGenerator()
+        with _diffusion_lock:
+            if _diffusion_generator is None:
+                _diffusion_generator = DiffusionImageGenerator()
     return _diffusion_generator
+
+# Import anında arka planda kur + ısıt - ilk istek model yüklemesini beklemesin.
+# Paylaşılan modda (SD_SHARED_GENERATOR=1) model sadece helpers.diffusion_server sürecinde yüklenir.
+if (DIFFUSION_AVAILABLE and os.getenv("SD_EAGER_WARMUP", "1") == "1"
+        and os.getenv("SD_SHARED_GENERATOR") != "1"):
+    threading.Thread(
+        target=lambda: get_diffusion_generator().ensure_ready(),
+        name="diffusion-warmup",
+        daemon=True,
+    ).start()
@@ -0,0 +1,175 @@
+"""
+Paylaşılan diffusion generator süreci.
+
+Her uvicorn/gunicorn worker'ı modeli (~2 GB) ayrı yükleyip VRAM'de ayrı kopya
+tutmasın diye pipeline tek bir süreçte yaşar; worker'lar UNIX socket üzerinden
+multiprocessing manager proxy'si ile istek gönderir. Süreç worker restart'larından
+bağımsızdır (ayrı session), reload sonrası model yeniden yüklenmez.
+
+Socket ve rastgele authkey dosyası kullanıcıya özel SD_SERVER_DIR (0700) altındadır;
+anahtar SD_SERVER_AUTHKEY ile de verilebilir.
+
+SD_SHARED_GENERATOR=1 ile açılır. Sunucu elle de başlatılabilir:
+    python -m helpers.diffusion_server
+"""
+from multiprocessing.managers import BaseManager
+import subprocess
+import threading
+import fcntl
+import tempfile
+import secrets
+import logging
+import time
+import sys
+import os
+
+logger = logging.getLogger(__name__)
+
+# Socket ve authkey sadece bu kullanıcının erişebildiği (0700) dizinde durur
+SERVER_DIR = os.getenv(
+    "SD_SERVER_DIR",
+    os.path.join(os.getenv("XDG_RUNTIME_DIR") or tempfile.gettempdir(), f"sd-generator-{os.getuid()}"),
+)
+SERVER_SOCKET = os.getenv("SD_SERVER_SOCKET", os.path.join(SERVER_DIR, "generator.sock"))
+AUTHKEY_FILE = os.path.join(SERVER_DIR, "authkey")
+LOCK_FILE = os.path.join(SERVER_DIR, "server.lock")
+
+# Sunucu ilk kez spawn edildiğinde socket'in açılmasını bekleme süresi (saniye)
+CONNECT_TIMEOUT = float(os.getenv("SD_SERVER_CONNECT_TIMEOUT", 30))
+
+
+class _GeneratorManager(BaseManager):
+    pass
+
+
+def _private_dir() -> str:
+    """SERVER_DIR'i 0700 olarak oluştur; başka kullanıcıya aitse veya açıksa reddet"""
+    os.makedirs(SERVER_DIR, mode=0o700, exist_ok=True)
+    st = os.stat(SERVER_DIR)
+    if st.st_uid != os.getuid() or st.st_mode & 0o077:
+        raise PermissionError(f"{SERVER_DIR} bu kullanıcıya özel değil (owner/mode kontrolü)")
+    return SERVER_DIR
+
+
+def _authkey() -> bytes:
+    """
+    SD_SERVER_AUTHKEY verilmişse onu, yoksa SERVER_DIR/authkey dosyasındaki rastgele
+    anahtarı kullan. Dosya yoksa 0600 olarak atomik oluşturulur (link ile - yarışta
+    ikinci süreç ilkinin anahtarını okur). Manager RPC'si pickle tabanlı, anahtar şart.
+    """
+    env_key = os.getenv("SD_SERVER_AUTHKEY")
+    if env_key:
+        return env_key.encode()
+    _private_dir()
+    if not os.path.exists(AUTHKEY_FILE):
+        fd, tmp_path = tempfile.mkstemp(dir=SERVER_DIR)
+        try:
+            with os.fdopen(fd, "w") as f:
+                f.write(secrets.token_hex(32))
+            os.link(tmp_path, AUTHKEY_FILE)
+        except FileExistsError:
+            pass
+        finally:
+            os.unlink(tmp_path)
+    st = os.stat(AUTHKEY_FILE)
+    if st.st_uid != os.getuid() or st.st_mode & 0o077:
+        raise PermissionError(f"{AUTHKEY_FILE} 0600 değil, kullanılmıyor")
+    with open(AUTHKEY_FILE) as f:
+        return f.read().strip().encode()
+
+
+def serve():
+    """Generator'ı bu süreçte yükle ve socket üzerinden sun"""
+    # Import burada - client süreçleri torch/diffusers yüklemesin
+    from helpers.diffusion_image_generator import get_diffusion_generator
+
+    _private_dir()
+
+    # Probe + unlink + bind tek kilit altında: eşzamanlı spawn edilen iki süreç
+    # birbirinin socket'ini silip yeniden bind edemesin
+    with open(LOCK_FILE, "w") as lock_file:
+        fcntl.flock(lock_file, fcntl.LOCK_EX)
+        try:
+            # Başka bir süreç zaten sunuyorsa çık
+            try:
+                _connect()
+                print(f"ℹ️ [SERVER] Generator server zaten çalışıyor: {SERVER_SOCKET}")
+                return
+            except (OSError, EOFError):
+                pass
+
+            # Çökmüş önceki sürecin socket dosyası bind'i engellemesin
+            if os.path.exists(SERVER_SOCKET):
+                os.unlink(SERVER_SOCKET)
+
+            _GeneratorManager.register("get_generator", callable=get_diffusion_generator)
+            manager = _GeneratorManager(address=SERVER_SOCKET, authkey=_authkey())
+            server = manager.get_server()
+        finally:
+            fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+    # Model yükleme + warmup arka planda; bu sırada gelen istekler ensure_ready'de bekler
+    threading.Thread(
+        target=lambda: get_diffusion_generator().ensure_ready(),
+        name="diffusion-warmup",
+        daemon=True,
+    ).start()
+
+    print(f"🚀 [SERVER] Generator server dinleniyor: {SERVER_SOCKET}")
+    server.serve_forever()
+
+
+def _connect() -> _GeneratorManager:
+    manager = _GeneratorManager(address=SERVER_SOCKET, authkey=_authkey())
+    manager.connect()
+    return manager
+
+
+def _spawn_server():
+    """Sunucuyu worker'dan bağımsız (ayrı session) bir süreç olarak başlat"""
+    service_dir = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+    subprocess.Popen(
+        [sys.executable, "-m", "helpers.diffusion_server"],
+        cwd=service_dir,
+        start_new_session=True,
+    )
+
+
+# Client singleton - proxy thread başına kendi bağlantısını açar
+_client = None
+_client_lock = threading.Lock()
+
+
+def get_diffusion_generator_client():
+    """
+    Paylaşılan generator'a proxy döner; generate_instagram_image(...) aynı imzayla çağrılır.
+    Sunucu çalışmıyorsa başlatılır.
+    """
+    global _client
+    if _client is None:
+        with _client_lock:
+            if _client is None:
+                try:
+                    manager = _connect()
+                except (OSError, EOFError):
+                    logger.info("Diffusion generator server not running, spawning it")
+                    _spawn_server()
+                    manager = _wait_for_server()
+                _GeneratorManager.register("get_generator")
+                _client = manager.get_generator()
+    return _client
+
+
+def _wait_for_server() -> _GeneratorManager:
+    deadline = time.monotonic() + CONNECT_TIMEOUT
+    while True:
+        try:
+            return _connect()
+        except (OSError, EOFError):
+            if time.monotonic() > deadline:
+                raise
+            time.sleep(0.5)
+
+
+if __name__ == "__main__":
+    serve()
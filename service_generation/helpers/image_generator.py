@@ -1,9 +1,21 @@
 import os
-import uuid
-from datetime import datetime
+import re
+import json
+import queue
+import asyncio
+import time
+import hashlib
+import atexit
+import itertools
+from itertools import islice
+import threading
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from functools import cached_property, lru_cache
 from typing import Dict, Any, List, Optional
 from PIL import Image, ImageDraw, ImageFont
 from io import BytesIO
+import numpy as np
 import logging
 from dotenv import load_dotenv
 
@@ -21,40 +33,417 @@ except ImportError as e:
 # Optional Gemini import for AI-powered image descriptions
 try:
     import google.generativeai as genai
+    from google.api_core.exceptions import ResourceExhausted
+    # HTTP 429 - exponential backoff ile tekrar denenir
+    RATE_LIMIT_ERRORS = (ResourceExhausted,)
     GEMINI_AVAILABLE = True
 except ImportError as e:
     print(f"⚠️ Gemini API not available for image generation: {e}")
     genai = None
+    RATE_LIMIT_ERRORS = ()
     GEMINI_AVAILABLE = False
 
+# Optional sentence-transformers import for semantic Gemini cache
+try:
+    from sentence_transformers import SentenceTransformer
+    SEMANTIC_CACHE_AVAILABLE = True
+except ImportError:
+    SentenceTransformer = None
+    SEMANTIC_CACHE_AVAILABLE = False
+
 load_dotenv()
 
 logger = logging.getLogger(__name__)
+# Kayıt başına debug logları - format maliyeti sadece DEBUG açıksa ödenir
+_dbg = logger.debug
+
+GEMINI_MODEL = 'gemini-2.5-pro'
+
+# Poster metinleri için TrueType font (Dockerfile'da fonts-dejavu-core kurulur)
+FONT_PATH = os.getenv("POSTER_FONT", "DejaVuSans.ttf")
+
+# Batch modda eşzamanlı Gemini isteği limiti ve 429 retry ayarları
+GEMINI_CONCURRENCY = int(os.getenv("GEMINI_CONCURRENCY", 8))
+GEMINI_MAX_RETRIES = 3
+GEMINI_BACKOFF_BASE = 2.0
+
+@lru_cache(maxsize=1)
+def _configure_gemini() -> bool:
+    """API key'i süreç başına bir kez ayarla"""
+    if not GEMINI_AVAILABLE:
+        logger.warning("⚠️ Gemini API kütüphanesi mevcut değil")
+        return False
+    gemini_key = os.getenv("GEMINI_API_KEY")
+    if not gemini_key:
+        logger.warning("⚠️ GEMINI_API_KEY bulunamadı")
+        return False
+    genai.configure(api_key=gemini_key)
+    return True
+
+@lru_cache(maxsize=1)
+def _get_gemini_model():
+    """Gemini 2.5 Pro client kurulumu - kurulamazsa None"""
+    try:
+        if not _configure_gemini():
+            return None
+        model = genai.GenerativeModel(GEMINI_MODEL)
+        print("✅ Gemini 2.5 Pro client kuruldu (Image Generation)")
+        logger.info("✅ Gemini 2.5 Pro client setup for image generation")
+        return model
+    except Exception as e:
+        logger.warning(f"⚠️ Gemini client kurulamadı: {e}")
+        return None
+
+# Gemini yanıtındaki "ALAN: değer" satırları
+_GEMINI_FIELD_RE = re.compile(
+    r'^[ \t]*(TITLE|MAIN_TEXT|HIGHLIGHT_KEYWORDS|CALL_TO_ACTION|ENHANCED_HASHTAGS|DESIGN_SUGGESTIONS):[ \t]*(.*?)[ \t\r]*$',
+    re.M
+)
+
+# Alan -> (enhanced_content key'i, dönüştürücü)
+_GEMINI_FIELDS = {
+    'TITLE': ('title', str),
+    'MAIN_TEXT': ('visual_summary', str),
+    'HIGHLIGHT_KEYWORDS': ('keywords', lambda v: [k.strip() for k in v.split(',')]),
+    'CALL_TO_ACTION': ('call_to_action', str),
+    'ENHANCED_HASHTAGS': ('hashtags', lambda v: [h.strip().replace('#', '') for h in v.split()]),
+    'DESIGN_SUGGESTIONS': ('design_suggestions', str),
+}
+
+@lru_cache(maxsize=256)
+def _title_from(visual_summary: str, keywords: tuple, default: str) -> str:
+    """Başlık çıkarımı - style varyantları aynı içerikle tekrar çağırır"""
+    if visual_summary:
+        # Take first meaningful part
+        words = visual_summary.split()[:4]
+        if len(words) >= 2:
+            return ' '.join(words).title()
+    
+    if keywords:
+        return ' '.join(keywords).title()
+    
+    return default
+
+def _fingerprint(content_data: Dict[str, Any], trend_data: Optional[Dict[str, Any]], style: str) -> str:
+    """content + trend + style için kısa, deterministik hash"""
+    payload = json.dumps({'c': content_data, 't': trend_data, 's': style}, sort_keys=True, default=str)
+    return hashlib.blake2b(payload.encode('utf-8'), digest_size=16).hexdigest()
+
+def _apply_gemini_field(line: str, enhanced_content: Dict[str, Any]):
+    """Tek satır "ALAN: değer" ise enhanced content'e yaz"""
+    m = _GEMINI_FIELD_RE.match(line)
+    if m:
+        key, convert = _GEMINI_FIELDS[m.group(1)]
+        enhanced_content[key] = convert(m.group(2))
+
+class LLMCache:
+    """
+    Gemini yanıtları için exact-match cache: key = normalize edilmiş prompt + model'in blake2b hash'i.
+    Bellekte TTL'li LRU (OrderedDict); persist_dir verilirse her kayıt <key>.json olarak
+    diske de yazılır ve süreç yeniden başladığında oradan okunur. Süresi dolan / evict
+    edilen kayıtların dosyası silinir, açılışta disk max_entries'e budanır.
+    """
+    
+    def __init__(self, max_entries: int = 512, ttl: float = 3600, persist_dir: Optional[str] = None):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.persist_dir = persist_dir
+        self._entries = OrderedDict()  # key -> (expires_at, text)
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        if persist_dir:
+            os.makedirs(persist_dir, exist_ok=True)
+            self._prune_disk()
+    
+    @staticmethod
+    def make_key(prompt: str, model: str = GEMINI_MODEL) -> str:
+        payload = json.dumps({"prompt": prompt.strip(), "model": model}, sort_keys=True)
+        return hashlib.blake2b(payload.encode("utf-8"), digest_size=32).hexdigest()
+    
+    def get(self, key: str) -> Optional[str]:
+        now = time.time()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                entry = self._load(key)
+            if entry is not None and entry[0] > now:
+                self._entries[key] = entry
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return entry[1]
+            self._entries.pop(key, None)
+            self.misses += 1
+        if entry is not None:
+            self._remove_file(key)
+        return None
+    
+    def set(self, key: str, text: str):
+        entry = (time.time() + self.ttl, text)
+        evicted = []
+        with self._lock:
+            self._entries[key] = entry
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                evicted.append(self._entries.popitem(last=False)[0])
+        for old_key in evicted:
+            self._remove_file(old_key)
+        if self.persist_dir:
+            try:
+                with open(os.path.join(self.persist_dir, f"{key}.json"), "w", encoding="utf-8") as f:
+                    json.dump({"expires_at": entry[0], "text": text}, f, ensure_ascii=False)
+            except OSError as e:
+                logger.warning(f"LLM cache write failed: {e}")
+    
+    def _remove_file(self, key: str):
+        if not self.persist_dir:
+            return
+        try:
+            os.remove(os.path.join(self.persist_dir, f"{key}.json"))
+        except OSError:
+            pass
+    
+    def _prune_disk(self):
+        """Süresi dolmuş kayıtları sil; kalanlardan en yeni max_entries tanesini tut"""
+        now = time.time()
+        alive = []
+        for name in os.listdir(self.persist_dir):
+            if not name.endswith(".json"):
+                continue
+            key = name[:-5]
+            entry = self._load(key)
+            if entry is None or entry[0] <= now:
+                self._remove_file(key)
+            else:
+                alive.append((entry[0], key))
+        alive.sort()
+        for _, key in alive[:max(0, len(alive) - self.max_entries)]:
+            self._remove_file(key)
+    
+    def _load(self, key: str):
+        if not self.persist_dir:
+            return None
+        try:
+            with open(os.path.join(self.persist_dir, f"{key}.json"), encoding="utf-8") as f:
+                data = json.load(f)
+            return data["expires_at"], data["text"]
+        except (OSError, ValueError, KeyError):
+            return None
+    
+    @property
+    def stats(self) -> Dict[str, Any]:
+        total = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / total if total else 0.0,
+            "entries": len(self._entries),
+        }
+
+# Aynı content/trend/style için Gemini'ye tekrar gitme
+_llm_cache = LLMCache(
+    max_entries=int(os.getenv("LLM_CACHE_SIZE", 512)),
+    ttl=float(os.getenv("LLM_CACHE_TTL", 3600)),
+    persist_dir=os.path.join(os.path.dirname(__file__), "..", "tmp", "llm_cache"),
+)
+
+class SemanticCache:
+    """
+    Aynı niyetli ama farklı yazılmış içerikler için Gemini yanıt cache'i.
+    Sorgular normalize embedding'lerle saklanır; benzerlik tek bir matris-vektör
+    çarpımıyla bulunur. Sadece aynı style'daki kayıtlar eşleşir.
+    LLMCache gibi boyut limitli ve TTL'li: süresi dolan ve max_entries'i aşan en eski
+    kayıtlar düşer. Disk'e her add'de değil flush_every kayıtta bir (ve çıkışta) yazılır.
+    """
+    
+    def __init__(self, persist_dir: str, threshold: float = 0.93, model_name: str = 'all-MiniLM-L6-v2',
+                 max_entries: int = 2048, ttl: float = 3600, flush_every: int = 32):
+        self.threshold = threshold
+        self.model_name = model_name
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.flush_every = flush_every
+        self._npz_path = os.path.join(persist_dir, "semcache.npz")
+        self._jsonl_path = os.path.join(persist_dir, "semcache.jsonl")
+        self._embedder = None
+        self._embeddings = None   # (N, D) float32, L2-normalize; eskiden yeniye
+        self._entries = []        # [{"style", "key", "text", "expires_at"}], _embeddings ile paralel
+        self._pending = 0         # son flush'tan beri eklenen kayıt sayısı
+        self._lock = threading.Lock()
+        self._write_lock = threading.Lock()
+        os.makedirs(persist_dir, exist_ok=True)
+        atexit.register(self.flush)
+    
+    def _encode(self, query: str) -> np.ndarray:
+        if self._embedder is None:
+            self._embedder = SentenceTransformer(self.model_name)
+            self._load()
+        return self._embedder.encode(query, normalize_embeddings=True).astype(np.float32)
+    
+    def _load(self):
+        """Önceki süreçten kalan kayıtları oku; dosyalar tutarsızsa boş başla"""
+        try:
+            embeddings = np.load(self._npz_path)["embeddings"]
+            with open(self._jsonl_path, encoding="utf-8") as f:
+                entries = [json.loads(line) for line in f if line.strip()]
+            if len(entries) == len(embeddings):
+                self._embeddings, self._entries = embeddings, entries
+                self._evict()
+        except (OSError, ValueError, KeyError):
+            pass
+    
+    def _evict(self):
+        """Süresi dolan ve limiti aşan en eski kayıtları at (kayıtlar eklenme sırasında)"""
+        now = time.time()
+        drop = 0
+        while drop < len(self._entries) and self._entries[drop].get("expires_at", 0) <= now:
+            drop += 1
+        drop = max(drop, len(self._entries) - self.max_entries)
+        if drop > 0:
+            self._entries = self._entries[drop:]
+            self._embeddings = self._embeddings[drop:] if self._entries else None
+    
+    def lookup(self, query: str, style: str) -> Optional[str]:
+        with self._lock:
+            q = self._encode(query)
+            self._evict()
+            if self._embeddings is None or not self._entries:
+                return None
+            sims = self._embeddings @ q
+            # Farklı style'daki kayıtlar eşleşmesin
+            for i, entry in enumerate(self._entries):
+                if entry["style"] != style:
+                    sims[i] = -1.0
+            best = int(sims.argmax())
+            if sims[best] > self.threshold:
+                return self._entries[best]["text"]
+            return None
+    
+    def add(self, query: str, style: str, key: str, text: str):
+        with self._lock:
+            q = self._encode(query)[None, :]
+            self._embeddings = q if self._embeddings is None else np.vstack([self._embeddings, q])
+            self._entries.append({"style": style, "key": key, "text": text,
+                                  "expires_at": time.time() + self.ttl})
+            self._evict()
+            self._pending += 1
+            if self._pending < self.flush_every:
+                return
+        self.flush()
+    
+    def flush(self):
+        """Güncel snapshot'ı diske yaz - dosyalar tmp + rename ile, lock dışında yazılır"""
+        with self._lock:
+            if not self._pending:
+                return
+            self._pending = 0
+            embeddings, entries = self._embeddings, list(self._entries)
+        with self._write_lock:
+            try:
+                if embeddings is None:
+                    for path in (self._npz_path, self._jsonl_path):
+                        if os.path.exists(path):
+                            os.remove(path)
+                    return
+                # np.savez uzantısız isme .npz ekler - tmp adı .npz ile bitsin
+                npz_tmp = f"{self._npz_path[:-4]}.tmp.npz"
+                np.savez(npz_tmp, embeddings=embeddings)
+                jsonl_tmp = f"{self._jsonl_path}.tmp"
+                with open(jsonl_tmp, "w", encoding="utf-8") as f:
+                    for entry in entries:
+                        f.write(json.dumps(entry, ensure_ascii=False) + "\n")
+                os.replace(npz_tmp, self._npz_path)
+                os.replace(jsonl_tmp, self._jsonl_path)
+            except OSError as e:
+                logger.warning(f"Semantic cache write failed: {e}")
 
 class InstagramPosterGenerator:
+    # Renk paletleri RGB tuple olarak - Pillow her draw çağrısında hex string parse etmesin
+    _MODERN_COLORS = {
+        'background': (0x1A, 0x1A, 0x1A),  # Dark background
+        'primary': (0xFF, 0x6B, 0x6B),     # Coral red
+        'secondary': (0x4E, 0xCD, 0xC4),   # Teal
+        'text': (0xFF, 0xFF, 0xFF),        # White
+        'accent': (0xFF, 0xE6, 0x6D)       # Yellow
+    }
+    
+    _GAMING_COLORS = {
+        'background': (0x0D, 0x11, 0x17),  # Dark GitHub-like
+        'primary': (0xFF, 0x00, 0x80),     # Hot pink
+        'secondary': (0x00, 0xD9, 0xFF),   # Cyan
+        'accent': (0xFF, 0xFF, 0x00),      # Yellow
+        'text': (0xFF, 0xFF, 0xFF)         # White
+    }
+    
+    _MINIMAL_COLORS = {
+        'background': (0xF8, 0xF9, 0xFA),  # Light gray
+        'primary': (0x2C, 0x3E, 0x50),     # Dark blue-gray
+        'secondary': (0x34, 0x98, 0xDB),   # Blue
+        'accent': (0xE7, 0x4C, 0x3C),      # Red
+        'text': (0x2C, 0x3E, 0x50),        # Dark text
+        'light': (0xBD, 0xC3, 0xC7)        # Light gray
+    }
+    
+    _TRENDY_COLORS = {
+        'primary': (0xFF, 0xFF, 0xFF),     # White
+        'secondary': (0xFF, 0xE6, 0x6D),   # Yellow
+        'accent': (0xFF, 0x6B, 0x6B),      # Coral
+        'text': (0x2C, 0x3E, 0x50)         # Dark text
+    }
+    
+    _FALLBACK_COLORS = {
+        'background': (0x2C, 0x3E, 0x50),
+        'border': (0x34, 0x98, 0xDB),
+        'title': (0xFF, 0xFF, 0xFF),
+        'summary': (0xBD, 0xC3, 0xC7),
+        'branding': (0x95, 0xA5, 0xA6)
+    }
+    
+    # Sabit dekorasyon geometrisi: (box, renk index'i: 0=primary, 1=secondary)
+    _CORNER_BOXES = (
+        (((50, 50), (100, 100)), 0),
+        (((980, 50), (1030, 100)), 1),
+        (((50, 980), (100, 1030)), 1),
+        (((980, 980), (1030, 1030)), 0),
+    )
+    _GAMING_BORDER_BOXES = tuple(
+        (((50 + i*5, 50 + i*5), (1030 - i*5, 200 - i*5)), i % 2) for i in range(5)
+    )
+    
     def __init__(self):
         self.poster_size = (1080, 1080)  # Instagram square format
         self.story_size = (1080, 1920)   # Instagram story format
-        self.gemini_client = None
-        self._setup_gemini_client()
+        # tmp directory bir kez oluşturulur
+        self._tmp_dir = os.path.normpath(os.path.join(os.path.dirname(__file__), "..", "tmp"))
+        os.makedirs(self._tmp_dir, exist_ok=True)
+        self._counter = itertools.count()
+        self._pid = os.getpid()
+        # fingerprint(content, trend, style) -> (expires_at, parse edilmiş enhanced content) (TTL'li LRU)
+        self._enhanced_cache = OrderedDict()
+        self._enhanced_lock = threading.Lock()
+        # Yeniden kullanılan 1080x1080 canvas'lar - her poster'da 3.3 MB alloc/free yok.
+        # Eşzamanlı poster limiti kadar tutulur; burst sonrası fazlası GC'ye bırakılır
+        self._canvas_pool = queue.LifoQueue(maxsize=GEMINI_CONCURRENCY)
+        self._gradient_bytes = None
+        self._canvas_executor = ThreadPoolExecutor(max_workers=2, thread_name_prefix="poster-canvas")
+        # size -> FreeTypeFont; her text çağrısında yeniden yüklenmesin
+        self._font_cache = {}
+        # (size, word) -> textlength; wrap hesabında tekrar ölçülmesin
+        self._width_cache = {}
+        # Semantic cache - embedder ilk kullanımda yüklenir
+        self._semantic_cache = None
+        if SEMANTIC_CACHE_AVAILABLE and os.getenv("SEMANTIC_CACHE", "1") == "1":
+            self._semantic_cache = SemanticCache(
+                persist_dir=os.path.join(os.path.dirname(__file__), "..", "tmp"),
+                threshold=float(os.getenv("SEMANTIC_CACHE_THRESHOLD", 0.93)),
+                max_entries=int(os.getenv("SEMANTIC_CACHE_SIZE", 2048)),
+                ttl=float(os.getenv("SEMANTIC_CACHE_TTL", 3600)),
+            )
         
-    def _setup_gemini_client(self):
-        """Gemini AI client kurulumu"""
-        if GEMINI_AVAILABLE:
-            try:
-                gemini_key = os.getenv("GEMINI_API_KEY")
-                if gemini_key:
-                    genai.configure(api_key=gemini_key)
-                    # Gemini 2.5 Pro modelini kullan
-                    self.gemini_client = genai.GenerativeModel('gemini-2.5-pro')
-                    print("✅ Gemini 2.5 Pro client kuruldu (Image Generation)")
-                    logger.info("✅ Gemini 2.5 Pro client setup for image generation")
-                else:
-                    logger.warning("⚠️ GEMINI_API_KEY bulunamadı")
-            except Exception as e:
-                logger.warning(f"⚠️ Gemini client kurulamadı: {e}")
-        else:
-            logger.warning("⚠️ Gemini API kütüphanesi mevcut değil")
+    @cached_property
+    def gemini_client(self):
+        """Gemini modeli ilk enhancement'ta kurulur; süreçteki tüm instance'lar aynı client'ı paylaşır"""
+        return _get_gemini_model()
         
     def create_instagram_poster(self, 
                               content_data: Dict[str, Any],
@@ -64,48 +453,148 @@ class InstagramPosterGenerator:
         Instagram poster oluştur - Gemini 2.5 Pro ile enhanced
         Returns: saved image file path
         """
+        # Arka plan (fill / gradient) Gemini yanıtı beklenirken hazırlansın
+        canvas = self._canvas_executor.submit(self._prepare_canvas, style)
         try:
             # Gemini ile content'i enhance et
             enhanced_content = self._enhance_content_with_gemini(content_data, trend_data, style)
-            
-            # Enhanced content ile poster oluştur
+        except Exception as e:
+            # Kullanılmayan canvas hazır olunca havuza dönsün
+            canvas.add_done_callback(lambda f: f.exception() is None and self._release_canvas(f.result()))
+            logger.error(f"Poster creation failed: {e}")
+            return self._create_fallback_poster(content_data)
+        
+        try:
+            # Enhanced content ile poster oluştur - canvas'ı _render_poster havuza geri verir
+            return self._render_poster(enhanced_content, trend_data, style, img=canvas.result())
+        except Exception as e:
+            logger.error(f"Poster creation failed: {e}")
+            return self._create_fallback_poster(content_data)
+    
+    def create_all_styles(self, content_data: Dict[str, Any],
+                          trend_data: Optional[Dict[str, Any]] = None) -> Dict[str, str]:
+        """
+        Aynı içerik için tüm style varyantlarını (A/B test) paralel oluştur.
+        Tek Gemini çağrısı yapılır; çizimler thread pool'da (Pillow C kodunda GIL'i bırakır).
+        Returns: {style: saved image file path}
+        """
+        enhanced_content = self._enhance_content_with_gemini(content_data, trend_data, "modern")
+        
+        styles = ("modern", "gaming", "minimal", "trendy")
+        
+        results = {}
+        with ThreadPoolExecutor(max_workers=len(styles)) as executor:
+            futures = {executor.submit(self._render_poster, enhanced_content, trend_data, name): name
+                       for name in styles}
+            for future in as_completed(futures):
+                name = futures[future]
+                try:
+                    results[name] = future.result()
+                except Exception as e:
+                    logger.error(f"{name} poster creation failed: {e}")
+                    results[name] = self._create_fallback_poster(content_data)
+        
+        return results
+    
+    async def create_instagram_posters_batch(self, items: List[Dict[str, Any]]) -> List[str]:
+        """
+        Birden fazla poster'ı eşzamanlı oluştur. items: [{"content_data", "trend_data", "style"}]
+        Gemini çağrıları aynı anda yapılır (GEMINI_CONCURRENCY limitli), PIL çizimi thread pool'da.
+        Returns: item sırasıyla saved image file path'leri
+        """
+        semaphore = asyncio.Semaphore(GEMINI_CONCURRENCY)
+        
+        async def create_one(item: Dict[str, Any]) -> str:
+            content_data = item.get('content_data', {})
+            trend_data = item.get('trend_data')
+            style = item.get('style', 'modern')
+            try:
+                async with semaphore:
+                    enhanced_content = await self._enhance_async(content_data, trend_data, style)
+                return await asyncio.to_thread(self._render_poster, enhanced_content, trend_data, style)
+            except Exception as e:
+                logger.error(f"Poster creation failed: {e}")
+                return await asyncio.to_thread(self._create_fallback_poster, content_data)
+        
+        return await asyncio.gather(*(create_one(item) for item in items))
+    
+    def _render_poster(self, enhanced_content: Dict[str, Any],
+                       trend_data: Optional[Dict[str, Any]], style: str,
+                       img: Optional[Image.Image] = None) -> str:
+        """
+        Style'a göre poster'ı çiz ve kaydet (img: _prepare_canvas ile hazırlanmış canvas).
+        Canvas çizim/kayıt hata verse de havuza geri verilir.
+        """
+        if img is None:
+            img = self._prepare_canvas(style)
+        try:
             if style == "gaming":
-                return self._create_gaming_poster(enhanced_content, trend_data)
+                return self._create_gaming_poster(enhanced_content, trend_data, img)
             elif style == "minimal":
-                return self._create_minimal_poster(enhanced_content, trend_data)
+                return self._create_minimal_poster(enhanced_content, trend_data, img)
             elif style == "trendy":
-                return self._create_trendy_poster(enhanced_content, trend_data)
+                return self._create_trendy_poster(enhanced_content, trend_data, img)
             else:
-                return self._create_modern_poster(enhanced_content, trend_data)
-                
-        except Exception as e:
-            logger.error(f"Poster creation failed: {e}")
-            return self._create_fallback_poster(content_data)
+                return self._create_modern_poster(enhanced_content, trend_data, img)
+        finally:
+            self._release_canvas(img)
+    
+    def _prepare_canvas(self, style: str) -> Image.Image:
+        """Style'ın arka planı çizilmiş canvas - metin içermez, Gemini'ye bağlı değil"""
+        if style == "trendy":
+            img = self._acquire_canvas()
+            img.frombytes(self._trendy_gradient())
+            return img
+        colors = {"gaming": self._GAMING_COLORS, "minimal": self._MINIMAL_COLORS}.get(style, self._MODERN_COLORS)
+        return self._acquire_canvas(colors['background'])
     
     def _enhance_content_with_gemini(self, content_data: Dict[str, Any], 
                                    trend_data: Optional[Dict[str, Any]], 
                                    style: str) -> Dict[str, Any]:
         """Gemini 2.5 Pro ile content'i enhance et"""
         
+        if not self._needs_enhancement(content_data, style):
+            return content_data
+        
         if not self.gemini_client:
             print("⚠️ [GEMINI] Client not available, using original content")
             return content_data
         
+        # Aynı content/trend/style için prompt + parse işini tekrarlama
+        fingerprint = _fingerprint(content_data, trend_data, style)
+        with self._enhanced_lock:
+            cached = self._enhanced_cache.get(fingerprint)
+            if cached is not None:
+                # LLMCache ile aynı TTL - süresi dolan sonuç tekrar üretilsin
+                if cached[0] > time.time():
+                    self._enhanced_cache.move_to_end(fingerprint)
+                    return cached[1].copy()
+                del self._enhanced_cache[fingerprint]
+        
         try:
             print(f"🤖 [GEMINI] Enhancing content with Gemini 2.5 Pro...")
             
-            # Gemini için prompt oluştur
-            prompt = self._create_enhancement_prompt(content_data, trend_data, style)
+            prompt, cache_key, semantic_query, cached = self._lookup_enhancement(content_data, trend_data, style)
+            if cached is not None:
+                enhanced_content = self._parse_gemini_response(cached, content_data)
+                self._remember_enhancement(fingerprint, enhanced_content)
+                return enhanced_content
             
-            # Gemini'den enhanced content al
-            response = self.gemini_client.generate_content(prompt)
-            enhanced_text = response.text
+            # Gemini'den enhanced content al - stream edilir, satırlar geldikçe parse edilir
+            for attempt in range(GEMINI_MAX_RETRIES + 1):
+                try:
+                    enhanced_text, enhanced_content = self._stream_enhancement(prompt, content_data)
+                    break
+                except RATE_LIMIT_ERRORS:
+                    if attempt == GEMINI_MAX_RETRIES:
+                        raise
+                    time.sleep(GEMINI_BACKOFF_BASE * 2 ** attempt)
+            self._store_enhancement(cache_key, semantic_query, style, enhanced_text)
             
             print(f"✅ [GEMINI] Content enhanced successfully")
             logger.info("Content enhanced with Gemini 2.5 Pro")
             
-            # Enhanced content'i parse et
-            enhanced_content = self._parse_gemini_response(enhanced_text, content_data)
+            self._remember_enhancement(fingerprint, enhanced_content)
             
             return enhanced_content
             
@@ -114,6 +603,115 @@ class InstagramPosterGenerator:
             logger.warning(f"Gemini enhancement failed: {e}")
             return content_data  # Fallback to original
     
+    def _stream_enhancement(self, prompt: str, content_data: Dict[str, Any]):
+        """
+        Gemini yanıtını stream et; tamamlanan her satır hemen enhanced content'e işlenir.
+        Returns: (tam yanıt metni - cache için, enhanced content)
+        """
+        enhanced_content = content_data.copy()
+        chunks = []
+        buffer = ''
+        for chunk in self.gemini_client.generate_content(prompt, stream=True):
+            chunks.append(chunk.text)
+            buffer += chunk.text
+            *lines, buffer = buffer.split('\n')
+            for line in lines:
+                _apply_gemini_field(line, enhanced_content)
+        _apply_gemini_field(buffer, enhanced_content)
+        return ''.join(chunks), enhanced_content
+    
+    async def _enhance_async(self, content_data: Dict[str, Any], 
+                             trend_data: Optional[Dict[str, Any]], 
+                             style: str) -> Dict[str, Any]:
+        """_enhance_content_with_gemini'nin async karşılığı - generate_content_async kullanır"""
+        
+        if not self._needs_enhancement(content_data, style) or not self.gemini_client:
+            return content_data
+        
+        try:
+            # Semantic cache embedding'i CPU işi - event loop'u bloklamasın
+            prompt, cache_key, semantic_query, cached = await asyncio.to_thread(
+                self._lookup_enhancement, content_data, trend_data, style
+            )
+            if cached is not None:
+                return self._parse_gemini_response(cached, content_data)
+            
+            for attempt in range(GEMINI_MAX_RETRIES + 1):
+                try:
+                    response = await self.gemini_client.generate_content_async(prompt)
+                    break
+                except RATE_LIMIT_ERRORS:
+                    if attempt == GEMINI_MAX_RETRIES:
+                        raise
+                    await asyncio.sleep(GEMINI_BACKOFF_BASE * 2 ** attempt)
+            enhanced_text = response.text
+            await asyncio.to_thread(self._store_enhancement, cache_key, semantic_query, style, enhanced_text)
+            
+            logger.info("Content enhanced with Gemini 2.5 Pro")
+            return self._parse_gemini_response(enhanced_text, content_data)
+            
+        except Exception as e:
+            logger.warning(f"Gemini enhancement failed: {e}")
+            return content_data  # Fallback to original
+    
+    def _lookup_enhancement(self, content_data: Dict[str, Any], 
+                            trend_data: Optional[Dict[str, Any]], 
+                            style: str):
+        """
+        Prompt'u oluştur ve cache'lere bak.
+        Returns: (prompt, cache_key, semantic_query, cached_text veya None)
+        """
+        # Gemini için prompt oluştur
+        prompt = self._create_enhancement_prompt(content_data, trend_data, style)
+        
+        # Aynı prompt daha önce sorulduysa cache'ten dön
+        cache_key = _llm_cache.make_key(prompt)
+        cached = _llm_cache.get(cache_key)
+        if cached is not None:
+            print(f"⚡ [GEMINI] Cache hit ({_llm_cache.stats['hit_rate']:.0%} hit rate)")
+            return prompt, cache_key, None, cached
+        
+        # Farklı yazılmış ama aynı niyetli içerik için semantic cache
+        semantic_query = self._semantic_query(content_data, trend_data)
+        if self._semantic_cache is not None:
+            similar = self._semantic_cache.lookup(semantic_query, style)
+            if similar is not None:
+                print(f"⚡ [GEMINI] Semantic cache hit")
+                _llm_cache.set(cache_key, similar)
+                return prompt, cache_key, semantic_query, similar
+        
+        return prompt, cache_key, semantic_query, None
+    
+    def _store_enhancement(self, cache_key: str, semantic_query: str, style: str, enhanced_text: str):
+        """Gemini yanıtını exact-match ve semantic cache'lere yaz"""
+        _llm_cache.set(cache_key, enhanced_text)
+        if self._semantic_cache is not None:
+            self._semantic_cache.add(semantic_query, style, cache_key, enhanced_text)
+    
+    @staticmethod
+    def _needs_enhancement(content_data: Dict[str, Any], style: str) -> bool:
+        """Boş içerik veya fallback style için Gemini'ye gitme - sadece genel dolgu metin döner"""
+        if style == 'fallback':
+            return False
+        return any([content_data.get('visual_summary'), content_data.get('keywords'), content_data.get('hashtags')])
+    
+    def _remember_enhancement(self, fingerprint: str, enhanced_content: Dict[str, Any]):
+        with self._enhanced_lock:
+            self._enhanced_cache[fingerprint] = (time.time() + _llm_cache.ttl, enhanced_content.copy())
+            while len(self._enhanced_cache) > 256:
+                self._enhanced_cache.popitem(last=False)
+    
+    @staticmethod
+    def _semantic_query(content_data: Dict[str, Any], trend_data: Optional[Dict[str, Any]]) -> str:
+        """Prompt şablonu hariç sadece değişken içerik - şablon tüm prompt'ları benzer gösterir"""
+        trends = trend_data.get('trends', []) if trend_data else []
+        return " | ".join([
+            content_data.get('visual_summary', ''),
+            ', '.join(content_data.get('keywords', [])),
+            ', '.join(content_data.get('hashtags', [])),
+            ', '.join(trends),
+        ])
+    
     def _create_enhancement_prompt(self, content_data: Dict[str, Any], 
                                  trend_data: Optional[Dict[str, Any]], 
                                  style: str) -> str:
@@ -155,26 +753,11 @@ Türkçe yanıtla ve Instagram'da viral olabilecek, görsel olarak çekici içer
         try:
             enhanced_content = original_content.copy()
             
-            lines = response_text.split('\n')
-            current_section = None
-            
-            for line in lines:
-                line = line.strip()
-                
-                if line.startswith('TITLE:'):
-                    enhanced_content['title'] = line.replace('TITLE:', '').strip()
-                elif line.startswith('MAIN_TEXT:'):
-                    enhanced_content['visual_summary'] = line.replace('MAIN_TEXT:', '').strip()
-                elif line.startswith('HIGHLIGHT_KEYWORDS:'):
-                    keywords_text = line.replace('HIGHLIGHT_KEYWORDS:', '').strip()
-                    enhanced_content['keywords'] = [k.strip() for k in keywords_text.split(',')]
-                elif line.startswith('CALL_TO_ACTION:'):
-                    enhanced_content['call_to_action'] = line.replace('CALL_TO_ACTION:', '').strip()
-                elif line.startswith('ENHANCED_HASHTAGS:'):
-                    hashtags_text = line.replace('ENHANCED_HASHTAGS:', '').strip()
-                    enhanced_content['hashtags'] = [h.strip().replace('#', '') for h in hashtags_text.split()]
-                elif line.startswith('DESIGN_SUGGESTIONS:'):
-                    enhanced_content['design_suggestions'] = line.replace('DESIGN_SUGGESTIONS:', '').strip()
+            # Tek regex taraması; aynı alan birden çok kez gelirse sonuncusu geçerli
+            fields = {m.group(1): m.group(2) for m in _GEMINI_FIELD_RE.finditer(response_text)}
+            for field, value in fields.items():
+                key, convert = _GEMINI_FIELDS[field]
+                enhanced_content[key] = convert(value)
             
             print(f"✅ [GEMINI] Content parsed successfully")
             return enhanced_content
@@ -183,11 +766,13 @@ Türkçe yanıtla ve Instagram'da viral olabilecek, görsel olarak çekici içer
             print(f"⚠️ [GEMINI] Parse error: {e}")
             return original_content
     
-    def _create_modern_poster(self, content_data: Dict[str, Any], trend_data: Optional[Dict[str, Any]]) -> str:
+    def _create_modern_poster(self, content_data: Dict[str, Any], trend_data: Optional[Dict[str, Any]],
+                              img: Optional[Image.Image] = None) -> str:
         """Modern style Instagram poster"""
         
         # Create image
-        img = Image.new('RGB', self.poster_size, color='#1a1a1a')  # Dark background
+        if img is None:
+            img = self._prepare_canvas("modern")
         draw = ImageDraw.Draw(img)
         
         try:
@@ -197,15 +782,15 @@ Türkçe yanıtla ve Instagram'da viral olabilecek, görsel olarak çekici içer
             text_font_size = 36
             
             # Colors
-            primary_color = '#FF6B6B'    # Coral red
-            secondary_color = '#4ECDC4'  # Teal
-            text_color = '#FFFFFF'       # White
-            accent_color = '#FFE66D'     # Yellow
+            primary_color = self._MODERN_COLORS['primary']
+            secondary_color = self._MODERN_COLORS['secondary']
+            text_color = self._MODERN_COLORS['text']
+            accent_color = self._MODERN_COLORS['accent']
             
             # Title area
             title = self._extract_title(content_data)
             self._draw_text_with_background(draw, title, (540, 200), title_font_size, 
-                                          text_color, primary_color, center=True)
+                                          text_color, primary_color, center=True, img=img)
             
             # Visual summary
             visual_summary = content_data.get('visual_summary', 'Amazing content!')
@@ -215,12 +800,12 @@ Türkçe yanıtla ve Instagram'da viral olabilecek, görsel olarak çekici içer
             # Keywords section
             keywords = content_data.get('keywords', [])
             if keywords:
-                self._draw_keywords_section(draw, keywords[:6], (100, 550), 
+                self._draw_keywords_section(draw, keywords, (100, 550), 
                                           secondary_color, text_color)
             
             # Trend info
             if trend_data and trend_data.get('trends'):
-                trends = trend_data['trends'][:3]
+                trends = trend_data['trends']
                 self._draw_trends_section(draw, trends, (100, 750), 
                                         accent_color, text_color)
             
@@ -239,19 +824,16 @@ Türkçe yanıtla ve Instagram'da viral olabilecek, görsel olarak çekici içer
         # Save image
         return self._save_image(img, "modern_poster")
     
-    def _create_gaming_poster(self, content_data: Dict[str, Any], trend_data: Optional[Dict[str, Any]]) -> str:
+    def _create_gaming_poster(self, content_data: Dict[str, Any], trend_data: Optional[Dict[str, Any]],
+                              img: Optional[Image.Image] = None) -> str:
         """Gaming style Instagram poster"""
         
         # Gaming color scheme
-        img = Image.new('RGB', self.poster_size, color='#0D1117')  # Dark GitHub-like
+        if img is None:
+            img = self._prepare_canvas("gaming")
         draw = ImageDraw.Draw(img)
         
-        gaming_colors = {
-            'primary': '#FF0080',     # Hot pink
-            'secondary': '#00D9FF',   # Cyan
-            'accent': '#FFFF00',      # Yellow
-            'text': '#FFFFFF'         # White
-        }
+        gaming_colors = self._GAMING_COLORS
         
         try:
             title = self._extract_title(content_data, default="🎮 GAMING CONTENT")
@@ -273,20 +855,16 @@ Türkçe yanıtla ve Instagram'da viral olabilecek, görsel olarak çekici içer
         
         return self._save_image(img, "gaming_poster")
     
-    def _create_minimal_poster(self, content_data: Dict[str, Any], trend_data: Optional[Dict[str, Any]]) -> str:
+    def _create_minimal_poster(self, content_data: Dict[str, Any], trend_data: Optional[Dict[str, Any]],
+                               img: Optional[Image.Image] = None) -> str:
         """Minimal style Instagram poster"""
         
         # Minimal color scheme
-        img = Image.new('RGB', self.poster_size, color='#F8F9FA')  # Light gray
+        if img is None:
+            img = self._prepare_canvas("minimal")
         draw = ImageDraw.Draw(img)
         
-        minimal_colors = {
-            'primary': '#2C3E50',     # Dark blue-gray
-            'secondary': '#3498DB',   # Blue
-            'accent': '#E74C3C',      # Red
-            'text': '#2C3E50',        # Dark text
-            'light': '#BDC3C7'        # Light gray
-        }
+        minimal_colors = self._MINIMAL_COLORS
         
         try:
             title = self._extract_title(content_data, default="Quality Content")
@@ -301,10 +879,10 @@ Türkçe yanıtla ve Instagram'da viral olabilecek, görsel olarak çekici içer
                                   42, minimal_colors['text'], max_width=780)
             
             # Minimal keywords
-            keywords = content_data.get('keywords', [])[:4]
+            keywords = content_data.get('keywords', [])
             if keywords:
                 y_pos = 650
-                for i, keyword in enumerate(keywords):
+                for i, keyword in enumerate(islice(keywords, 4)):
                     x_pos = 200 + (i * 170)
                     draw.rectangle([(x_pos-10, y_pos-10), (x_pos+150, y_pos+40)], 
                                  outline=minimal_colors['secondary'], width=2)
@@ -320,28 +898,16 @@ Türkçe yanıtla ve Instagram'da viral olabilecek, görsel olarak çekici içer
         
         return self._save_image(img, "minimal_poster")
     
-    def _create_trendy_poster(self, content_data: Dict[str, Any], trend_data: Optional[Dict[str, Any]]) -> str:
+    def _create_trendy_poster(self, content_data: Dict[str, Any], trend_data: Optional[Dict[str, Any]],
+                              img: Optional[Image.Image] = None) -> str:
         """Trendy style Instagram poster"""
         
-        # Trendy gradient background
-        img = Image.new('RGB', self.poster_size, color='#FF6B6B')
+        # Trendy gradient background - havuzdaki canvas'ın üzerine yazılır
+        if img is None:
+            img = self._prepare_canvas("trendy")
         draw = ImageDraw.Draw(img)
         
-        # Create gradient effect (simple version)
-        for y in range(self.poster_size[1]):
-            ratio = y / self.poster_size[1]
-            r = int(255 * (1 - ratio) + 107 * ratio)  # 255 to 107
-            g = int(107 * (1 - ratio) + 185 * ratio)  # 107 to 185
-            b = int(107 * (1 - ratio) + 240 * ratio)  # 107 to 240
-            
-            draw.line([(0, y), (self.poster_size[0], y)], fill=(r, g, b))
-        
-        trendy_colors = {
-            'primary': '#FFFFFF',     # White
-            'secondary': '#FFE66D',   # Yellow
-            'accent': '#FF6B6B',      # Coral
-            'text': '#2C3E50'         # Dark text
-        }
+        trendy_colors = self._TRENDY_COLORS
         
         try:
             title = self._extract_title(content_data, default="🔥 TRENDING NOW")
@@ -352,7 +918,7 @@ Türkçe yanıtla ve Instagram'da viral olabilecek, görsel olarak çekici içer
             
             # Trend indicators
             if trend_data and trend_data.get('trends'):
-                trends = trend_data['trends'][:3]
+                trends = trend_data['trends']
                 self._draw_trend_badges(draw, trends, (540, 350), trendy_colors)
             
             # Visual content
@@ -375,57 +941,100 @@ Türkçe yanıtla ve Instagram'da viral olabilecek, görsel olarak çekici içer
     def _create_fallback_poster(self, content_data: Dict[str, Any]) -> str:
         """Simple fallback poster when advanced creation fails"""
         
-        img = Image.new('RGB', self.poster_size, color='#2C3E50')
-        draw = ImageDraw.Draw(img)
-        
-        # Simple design
-        title = self._extract_title(content_data, default="Content Generated")
-        
-        # Border
-        draw.rectangle([(50, 50), (1030, 1030)], outline='#3498DB', width=8)
-        
-        # Title
-        self._draw_simple_text(draw, title, (540, 300), 60, '#FFFFFF', center=True)
-        
-        # Visual summary
-        visual_summary = content_data.get('visual_summary', 'Generated content')
-        self._draw_simple_text(draw, visual_summary[:50] + "...", (540, 500), 32, '#BDC3C7', center=True)
-        
-        # Simple branding
-        self._draw_simple_text(draw, "AI Generated", (540, 800), 28, '#95A5A6', center=True)
-        
-        return self._save_image(img, "fallback_poster")
+        img = self._acquire_canvas(self._FALLBACK_COLORS['background'])
+        try:
+            draw = ImageDraw.Draw(img)
+            
+            # Simple design
+            title = self._extract_title(content_data, default="Content Generated")
+            
+            # Border
+            draw.rectangle([(50, 50), (1030, 1030)], outline=self._FALLBACK_COLORS['border'], width=8)
+            
+            # Title
+            self._draw_simple_text(draw, title, (540, 300), 60, self._FALLBACK_COLORS['title'], center=True)
+            
+            # Visual summary
+            visual_summary = content_data.get('visual_summary', 'Generated content')
+            self._draw_simple_text(draw, visual_summary[:50] + "...", (540, 500), 32, self._FALLBACK_COLORS['summary'], center=True)
+            
+            # Simple branding
+            self._draw_simple_text(draw, "AI Generated", (540, 800), 28, self._FALLBACK_COLORS['branding'], center=True)
+            
+            return self._save_image(img, "fallback_poster")
+        finally:
+            self._release_canvas(img)
     
     # Helper methods
+    def _acquire_canvas(self, color: Optional[tuple] = None) -> Image.Image:
+        """Havuzdan poster canvas'ı al (yoksa oluştur); color verilirse tek fill ile temizle"""
+        try:
+            img = self._canvas_pool.get_nowait()
+        except queue.Empty:
+            return Image.new('RGB', self.poster_size, color=color or 0)
+        if color is not None:
+            img.paste(color, (0, 0) + self.poster_size)
+        return img
+    
+    def _release_canvas(self, img: Image.Image):
+        """Canvas'ı bir sonraki poster için havuza geri ver; havuz doluysa bırak"""
+        try:
+            self._canvas_pool.put_nowait(img)
+        except queue.Full:
+            pass
+    
+    def _trendy_gradient(self) -> bytes:
+        """Dikey gradient (255,107,107) -> (107,185,240); boyuta bağlı sabit, bir kez hesaplanır"""
+        if self._gradient_bytes is None:
+            width, height = self.poster_size
+            ratio = np.arange(height, dtype=np.float32)[:, None] / height
+            start = np.array([255, 107, 107], dtype=np.float32)
+            end = np.array([107, 185, 240], dtype=np.float32)
+            rows = (start * (1 - ratio) + end * ratio).astype(np.uint8)
+            self._gradient_bytes = np.broadcast_to(rows[:, None, :], (height, width, 3)).tobytes()
+        return self._gradient_bytes
+    
     def _extract_title(self, content_data: Dict[str, Any], default: str = "Generated Content") -> str:
         """Extract title from content data"""
         
-        visual_summary = content_data.get('visual_summary', '')
-        keywords = content_data.get('keywords', [])
-        
-        if visual_summary:
-            # Take first meaningful part
-            words = visual_summary.split()[:4]
-            if len(words) >= 2:
-                return ' '.join(words).title()
-        
-        if keywords:
-            return ' '.join(keywords[:3]).title()
-        
-        return default
+        return _title_from(content_data.get('visual_summary', ''),
+                           tuple(content_data.get('keywords', [])[:3]), default)
+    
+    def _font(self, size: int):
+        """Boyuta göre TrueType font - bir kez yüklenir, sonra cache'ten"""
+        font = self._font_cache.get(size)
+        if font is None:
+            try:
+                font = ImageFont.truetype(FONT_PATH, size)
+            except OSError:
+                logger.warning(f"Font bulunamadı ({FONT_PATH}), default bitmap font kullanılıyor")
+                font = ImageFont.load_default()
+            self._font_cache[size] = font
+        return font
+    
+    def _word_width(self, draw, word: str, size: int) -> float:
+        """Kelimenin piksel genişliği - (size, word) başına tek textlength çağrısı"""
+        key = (size, word)
+        width = self._width_cache.get(key)
+        if width is None:
+            if len(self._width_cache) >= 10000:
+                self._width_cache.clear()
+            width = self._width_cache[key] = draw.textlength(word, font=self._font(size))
+        return width
     
     def _draw_simple_text(self, draw, text: str, position: tuple, size: int, color: str, center: bool = False):
         """Draw simple text (fallback when custom fonts fail)"""
+        font = self._font(size)
         try:
             if center:
-                bbox = draw.textbbox((0, 0), text)
+                bbox = draw.textbbox((0, 0), text, font=font)
                 text_width = bbox[2] - bbox[0]
                 text_height = bbox[3] - bbox[1]
                 x = position[0] - text_width // 2
                 y = position[1] - text_height // 2
-                draw.text((x, y), text, fill=color)
+                draw.text((x, y), text, fill=color, font=font)
             else:
-                draw.text(position, text, fill=color)
+                draw.text(position, text, fill=color, font=font)
         except Exception:
             # Ultra-simple fallback
             draw.text(position, text[:30], fill=color)
@@ -436,46 +1045,58 @@ Türkçe yanıtla ve Instagram'da viral olabilecek, görsel olarak çekici içer
         lines = []
         current_line = []
         
+        try:
+            # Kelime genişlikleri font boyutu başına cache'lenir; satır genişliği toplanarak hesaplanır
+            space_width = self._word_width(draw, ' ', size)
+            word_widths = {word: self._word_width(draw, word, size) for word in set(words)}
+        except Exception:
+            # Rough estimate
+            space_width = 12
+            word_widths = {word: len(word) * 12 for word in set(words)}
+        
+        current_width = 0
         for word in words:
-            test_line = ' '.join(current_line + [word])
-            try:
-                bbox = draw.textbbox((0, 0), test_line)
-                text_width = bbox[2] - bbox[0]
-                
-                if text_width <= max_width:
-                    current_line.append(word)
-                else:
-                    if current_line:
-                        lines.append(' '.join(current_line))
-                        current_line = [word]
-                    else:
-                        lines.append(word)
-            except:
-                # Simple fallback
-                if len(test_line) * 12 <= max_width:  # Rough estimate
-                    current_line.append(word)
-                else:
-                    if current_line:
-                        lines.append(' '.join(current_line))
-                        current_line = [word]
+            word_width = word_widths[word]
+            test_width = current_width + space_width + word_width if current_line else word_width
+            
+            if test_width <= max_width:
+                current_line.append(word)
+                current_width = test_width
+            elif current_line:
+                lines.append(' '.join(current_line))
+                current_line = [word]
+                current_width = word_width
+            else:
+                lines.append(word)
         
         if current_line:
             lines.append(' '.join(current_line))
         
-        # Draw lines
-        y_offset = 0
-        line_height = size + 10
-        
-        for line in lines[:6]:  # Max 6 lines
-            self._draw_simple_text(draw, line, (position[0], position[1] + y_offset), size, color)
-            y_offset += line_height
+        # Draw lines - tek multiline_text çağrısı
+        self._draw_lines(draw, list(islice(lines, 6)), position, size, color, line_height=size + 10)  # Max 6 lines
+    
+    def _draw_lines(self, draw, lines: List[str], position: tuple, size: int, color, line_height: int):
+        """Satırları sabit satır aralığıyla tek PIL çağrısında çiz"""
+        if not lines:
+            return
+        try:
+            font = self._font(size)
+            # multiline_text satır aralığı = "A" yüksekliği + spacing
+            spacing = line_height - draw.textbbox((0, 0), "A", font=font)[3]
+            draw.multiline_text(position, '\n'.join(lines), fill=color, font=font, spacing=spacing)
+        except Exception:
+            for i, line in enumerate(lines):
+                self._draw_simple_text(draw, line, (position[0], position[1] + i * line_height), size, color)
     
     def _draw_text_with_background(self, draw, text: str, position: tuple, size: int, 
-                                 text_color: str, bg_color: str, center: bool = False):
-        """Draw text with background"""
+                                 text_color: str, bg_color: str, center: bool = False,
+                                 img: Optional[Image.Image] = None):
+        """Draw text with background (img verilirse arka plan tek paste ile doldurulur)"""
         try:
+            font = self._font(size)
+            
             # Get text dimensions
-            bbox = draw.textbbox((0, 0), text)
+            bbox = draw.textbbox((0, 0), text, font=font)
             text_width = bbox[2] - bbox[0]
             text_height = bbox[3] - bbox[1]
             
@@ -487,12 +1108,15 @@ Türkçe yanıtla ve Instagram'da viral olabilecek, görsel olarak çekici içer
             
             # Draw background rectangle
             padding = 20
-            draw.rectangle([(x - padding, y - padding), 
-                          (x + text_width + padding, y + text_height + padding)], 
-                         fill=bg_color)
+            box = (x - padding, y - padding, x + text_width + padding + 1, y + text_height + padding + 1)
+            if img is not None:
+                # Renkle paste: ara tile / draw path'i olmadan doğrudan bölge doldurma
+                img.paste(bg_color, box)
+            else:
+                draw.rectangle([box[:2], (box[2] - 1, box[3] - 1)], fill=bg_color)
             
             # Draw text
-            draw.text((x, y), text, fill=text_color)
+            draw.text((x, y), text, fill=text_color, font=font)
             
         except Exception:
             # Fallback
@@ -513,10 +1137,7 @@ Türkçe yanıtla ve Instagram'da viral olabilecek, görsel olarak çekici içer
         """Draw keywords as badges"""
         x, y = position
         
-        for i, keyword in enumerate(keywords):
-            if i >= 6:  # Max 6 keywords
-                break
-                
+        for i, keyword in enumerate(islice(keywords, 6)):  # Max 6 keywords
             col = i % 3
             row = i // 3
             
@@ -540,9 +1161,8 @@ Türkçe yanıtla ve Instagram'da viral olabilecek, görsel olarak çekici içer
         self._draw_simple_text(draw, "🔥 TRENDING:", (x, y), 32, accent_color)
         
         # Trends
-        for i, trend in enumerate(trends[:3]):
-            trend_y = y + 50 + (i * 40)
-            self._draw_simple_text(draw, f"• {trend}", (x + 20, trend_y), 28, text_color)
+        self._draw_lines(draw, [f"• {trend}" for trend in islice(trends, 3)], (x + 20, y + 50), 28,
+                         text_color, line_height=40)
     
     def _draw_branding(self, draw, position: tuple, color: str):
         """Draw branding/watermark"""
@@ -553,21 +1173,19 @@ Türkçe yanıtla ve Instagram'da viral olabilecek, görsel olarak çekici içer
         """Add decorative elements"""
         # Simple geometric shapes
         try:
-            # Corner decorations
-            draw.rectangle([(50, 50), (100, 100)], fill=primary_color)
-            draw.rectangle([(980, 50), (1030, 100)], fill=secondary_color)
-            draw.rectangle([(50, 980), (100, 1030)], fill=secondary_color)
-            draw.rectangle([(980, 980), (1030, 1030)], fill=primary_color)
+            # Corner decorations - köşegen köşeler aynı renk
+            colors = (primary_color, secondary_color)
+            for box, color_index in self._CORNER_BOXES:
+                draw.rectangle(box, fill=colors[color_index])
         except Exception:
             pass  # Skip decorations if they fail
     
     def _draw_gaming_header(self, draw, title: str, colors: dict):
         """Draw gaming style header"""
-        # Gaming border effect
-        for i in range(5):
-            color = colors['primary'] if i % 2 == 0 else colors['secondary']
-            draw.rectangle([(50 + i*5, 50 + i*5), (1030 - i*5, 200 - i*5)], 
-                         outline=color, width=2)
+        # Gaming border effect - iç içe 5 çerçeve, primary/secondary dönüşümlü
+        border_colors = (colors['primary'], colors['secondary'])
+        for box, color_index in self._GAMING_BORDER_BOXES:
+            draw.rectangle(box, outline=border_colors[color_index], width=2)
         
         # Title
         self._draw_simple_text(draw, title, (540, 125), 56, colors['text'], center=True)
@@ -578,7 +1196,7 @@ Türkçe yanıtla ve Instagram'da viral olabilecek, görsel olarak çekici içer
         self._draw_wrapped_text(draw, visual_summary, (100, 250), 36, colors['text'], 880)
         
         # Gaming keywords as power-ups
-        for i, keyword in enumerate(keywords[:4]):
+        for i, keyword in enumerate(islice(keywords, 4)):
             x = 150 + (i * 200)
             y = 450
             
@@ -592,14 +1210,14 @@ Türkçe yanıtla ve Instagram'da viral olabilecek, görsel olarak çekici içer
         draw.rectangle([(50, 800), (1030, 950)], fill=colors['primary'], outline=colors['secondary'], width=3)
         
         # Hashtags
-        hashtag_text = ' '.join(hashtags[:8])
+        hashtag_text = ' '.join(islice(hashtags, 8))
         self._draw_wrapped_text(draw, hashtag_text, (100, 830), 28, colors['text'], 830)
     
     def _draw_trend_badges(self, draw, trends: List[str], position: tuple, colors: dict):
         """Draw trend badges"""
         x, y = position
         
-        for i, trend in enumerate(trends):
+        for i, trend in enumerate(islice(trends, 3)):
             badge_x = x - 300 + (i * 200)
             
             # Badge
@@ -616,32 +1234,38 @@ Türkçe yanıtla ve Instagram'da viral olabilecek, görsel olarak çekici içer
             (x+150, y+50), (x-150, y+80), (x+50, y+100)
         ]
         
-        for i, hashtag in enumerate(hashtags[:6]):
+        for i, hashtag in enumerate(islice(hashtags, 6)):
             if i < len(positions):
                 pos = positions[i]
                 size = 24 + (i % 3) * 4  # Varying sizes
                 self._draw_simple_text(draw, f"#{hashtag}", pos, size, colors['primary'])
     
-    def _save_image(self, img: Image.Image, prefix: str) -> str:
-        """Save image to tmp directory and return filepath"""
+    def _unique_id(self) -> str:
+        """ns timestamp + pid + süreç içi sayaçtan kısa blake2b id - entropy syscall'ı yok"""
+        h = hashlib.blake2b(digest_size=6)
+        h.update(time.time_ns().to_bytes(8, 'little'))
+        h.update(self._pid.to_bytes(4, 'little'))
+        h.update(next(self._counter).to_bytes(8, 'little'))
+        return h.hexdigest()
+    
+    def _save_image(self, img: Image.Image, prefix: str, fast: bool = True) -> str:
+        """
+        Save image to tmp directory and return filepath.
+        fast=True: zlib level 1, optimize pass yok - tmp'deki poster'lar hemen tüketilir
+        """
         try:
-            # Create tmp directory if not exists
-            tmp_dir = os.path.join(os.path.dirname(__file__), "..", "tmp")
-            os.makedirs(tmp_dir, exist_ok=True)
-            
             # Generate unique filename
-            timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-            unique_id = str(uuid.uuid4())[:8]
-            filename = f"{prefix}_{timestamp}_{unique_id}.png"
-            filepath = os.path.join(tmp_dir, filename)
+            filename = f"{prefix}_{self._unique_id()}.png"
+            filepath = os.path.join(self._tmp_dir, filename)
             
-            # Save image with high quality
-            img.save(filepath, "PNG", quality=95, optimize=True)
+            # PNG kayıpsız; quality parametresi PNG'de etkisiz
+            if fast:
+                img.save(filepath, format="PNG", compress_level=1)
+            else:
+                img.save(filepath, format="PNG", optimize=True)
             
             # Log the save operation
-            print(f"🖼️ [IMAGE SAVED] {filename}")
-            print(f"📁 [LOCATION] {tmp_dir}")
-            print(f"📏 [SIZE] {img.size[0]}x{img.size[1]} pixels")
+            _dbg("🖼️ [IMAGE SAVED] %s in %s (%dx%d)", filename, self._tmp_dir, img.size[0], img.size[1])
             logger.info(f"Instagram poster saved to tmp: {filename}")
             
             return filepath
@@ -653,9 +1277,12 @@ Türkçe yanıtla ve Instagram'da viral olabilecek, görsel olarak çekici içer
 
 # Singleton instance
 _image_generator = None
+_image_generator_lock = threading.Lock()
 
 def get_image_generator() -> InstagramPosterGenerator:
     global _image_generator
     if _image_generator is None:
-        _image_generator = InstagramPosterGenerator()
+        with _image_generator_lock:
+            if _image_generator is None:
+                _image_generator = InstagramPosterGenerator()
     return _image_generator
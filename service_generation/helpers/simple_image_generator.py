@@ -1,182 +1,289 @@
 import os
-import uuid
-from datetime import datetime
-from typing import Dict, Any, List, Optional
+import time
+from functools import lru_cache
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, Any, List, Optional, Tuple
 import logging
+import PIL
 from PIL import Image, ImageDraw, ImageFont
+import numpy as np
 import requests
 from dotenv import load_dotenv
 
 load_dotenv()
 logger = logging.getLogger(__name__)
+logger.addHandler(logging.NullHandler())
+_dbg = logger.debug
+
+# Pillow-SIMD sürümleri ".postN" ekiyle yayınlanır (Docker'da PILLOW_SIMD=1 build arg'ı ile kurulur)
+PILLOW_SIMD = "post" in PIL.__version__
+if not PILLOW_SIMD:
+    _dbg("Pillow-SIMD not installed (Pillow %s), LANCZOS resize runs without AVX2", PIL.__version__)
+
+# Poster metinleri için TrueType font (Dockerfile'da fonts-dejavu-core kurulur)
+FONT_PATH = os.getenv("POSTER_FONT", "DejaVuSans.ttf")
+
+# Başlık çıkarımında atlanan kelimeler
+STOPWORDS = frozenset({'ile', 'için', 'olan', 'bir', 'bu', 'şu'})
+
+# Style-based prompt
+_STYLE_PROMPTS = {
+    "modern": "modern minimalist design, clean aesthetics, professional layout",
+    "gaming": "gaming aesthetic, neon colors, futuristic design, cyberpunk style",
+    "minimal": "minimal design, white background, clean typography",
+    "trendy": "trendy social media design, vibrant colors, instagram style"
+}
+
+# Style-based colors
+_COLOR_SCHEMES = {
+    "modern": {
+        "bg": "#1a1a1a", "primary": "#FF6B6B", "secondary": "#4ECDC4", 
+        "text": "#FFFFFF", "accent": "#FFE66D"
+    },
+    "gaming": {
+        "bg": "#0D1117", "primary": "#FF0080", "secondary": "#00D9FF", 
+        "text": "#FFFFFF", "accent": "#FFFF00"
+    },
+    "minimal": {
+        "bg": "#F8F9FA", "primary": "#2C3E50", "secondary": "#3498DB", 
+        "text": "#2C3E50", "accent": "#E74C3C"
+    },
+    "trendy": {
+        "bg": "#FF6B6B", "primary": "#FFFFFF", "secondary": "#FFE66D", 
+        "text": "#2C3E50", "accent": "#6BB6FF"
+    }
+}
+
+_STYLE_EMOJI = {"gaming": "🎮", "modern": "💼", "minimal": "✨", "trendy": "🔥"}
+
+# Kayıt formatı -> dosya uzantısı
+_EXTENSIONS = {"WEBP": "webp", "JPEG": "jpg", "PNG": "png"}
+
+def _output_format(output_format: str) -> str:
+    """output_format parametresini doğrula: WEBP (varsayılan), JPEG veya PNG"""
+    fmt = output_format.upper()
+    if fmt == "JPG":
+        fmt = "JPEG"
+    if fmt not in _EXTENSIONS:
+        raise ValueError(f"Desteklenmeyen output_format: {output_format}")
+    return fmt
+
+@lru_cache(maxsize=32)
+def _get_font(size: int):
+    """Boyuta göre TrueType font - bir kez yüklenir, sonra cache'ten"""
+    try:
+        return ImageFont.truetype(FONT_PATH, size)
+    except OSError:
+        logger.warning(f"Font bulunamadı ({FONT_PATH}), default bitmap font kullanılıyor")
+        return ImageFont.load_default()
+
+@lru_cache(maxsize=4096)
+def _word_width(word: str, size: int) -> float:
+    """Kelimenin piksel genişliği - (word, size) başına tek getlength çağrısı"""
+    return _get_font(size).getlength(word)
+
+@lru_cache(maxsize=16)
+def _badge_sprite(fill: str, outline: str, width: int = 2, radius: int = 15,
+                  size: tuple = (120, 50)) -> Image.Image:
+    """Keyword badge'i için şeffaf RGBA sprite - renk kombinasyonu başına bir kez çizilir"""
+    sprite = Image.new('RGBA', (size[0] + 1, size[1] + 1), (0, 0, 0, 0))
+    ImageDraw.Draw(sprite).rounded_rectangle([(0, 0), size], radius=radius,
+                                             fill=fill, outline=outline, width=width)
+    return sprite
+
+def _fill_box(arr: np.ndarray, box: tuple, fill: str, outline: str, width: int):
+    """ImageDraw.rectangle eşdeğeri: (x0, y0, x1, y1) dahil kutuyu doldur, kenarlığı width piksel çiz"""
+    x0, y0, x1, y1 = box
+    arr[y0:y1 + 1, x0:x1 + 1] = _hex_to_rgb(outline)
+    arr[y0 + width:y1 + 1 - width, x0 + width:x1 + 1 - width] = _hex_to_rgb(fill)
+
+@lru_cache(maxsize=64)
+def _hex_to_rgb(hex_color: str) -> tuple:
+    hex_color = hex_color.lstrip('#')
+    return tuple(int(hex_color[i:i+2], 16) for i in (0, 2, 4))
+
+@lru_cache(maxsize=256)
+def _build_prompt(style: str, visual_summary: str, keywords: tuple) -> str:
+    """Prompt metni - aynı içerik farklı isteklerde tekrar gelir"""
+    style_desc = _STYLE_PROMPTS.get(style, _STYLE_PROMPTS["modern"])
+    keywords_text = ", ".join(keywords)
+    return f"{style_desc}, {visual_summary}, {keywords_text}, high quality, digital art, social media ready"
 
 class SimpleImageGenerator:
     def __init__(self):
         self.poster_size = (1080, 1080)  # Instagram square format
+        self._tmp_dir = os.path.abspath(os.path.join(os.path.dirname(__file__), "..", "tmp"))
+        os.makedirs(self._tmp_dir, exist_ok=True)
+        self._templates = {}  # style -> statik poster katmanı
+        self._white_canvas = Image.new('RGB', self.poster_size, color='white')
+        self._executor = ThreadPoolExecutor(max_workers=os.cpu_count(), thread_name_prefix="simple-poster")
         
     def generate_instagram_image(self, 
                                 content_data: Dict[str, Any],
                                 trend_data: Optional[Dict[str, Any]] = None,
-                                style: str = "modern") -> str:
+                                style: str = "modern",
+                                output_format: str = "WEBP") -> str:
         """
-        Basit image generation - gerçek AI modeli ile
+        Basit image generation - gerçek AI modeli ile.
+        output_format: "WEBP" (varsayılan), "JPEG" veya "PNG" (kayıpsız)
         """
+        fmt = _output_format(output_format)
         try:
-            print(f"\n🎨 [IMAGE GEN] Starting Instagram image generation...")
-            print(f"🎨 [IMAGE GEN] Style: {style}")
-            print(f"📊 [IMAGE GEN] Content data received")
-            
             # Input data debug
-            visual_summary = content_data.get('visual_summary', 'amazing content')
-            keywords = content_data.get('keywords', [])
-            hashtags = content_data.get('hashtags', [])
-            
-            print(f"📋 [INPUT] Visual Summary: {visual_summary}")
-            print(f"📋 [INPUT] Keywords: {keywords}")
-            print(f"📋 [INPUT] Hashtags: {hashtags}")
-            
-            if trend_data:
-                trends = trend_data.get('trends', [])
-                print(f"📈 [INPUT] Trends: {trends}")
+            if logger.isEnabledFor(logging.DEBUG):
+                _dbg("🎨 [IMAGE GEN] Style: %s", style)
+                _dbg("📋 [INPUT] Visual Summary: %s", content_data.get('visual_summary', 'amazing content'))
+                _dbg("📋 [INPUT] Keywords: %s, hashtags: %s",
+                     content_data.get('keywords', []), content_data.get('hashtags', []))
+                if trend_data:
+                    _dbg("📈 [INPUT] Trends: %s", trend_data.get('trends', []))
             
             # AI prompt oluştur
             prompt = self._create_ai_prompt(content_data, trend_data, style)
-            print(f"✨ [PROMPT] Generated AI prompt: {prompt}")
+            _dbg("✨ [PROMPT] Generated AI prompt: %s", prompt)
             
             # AI image generation dene
             ai_image = self._try_ai_generation(prompt)
             
-            if ai_image:
-                print(f"🤖 [AI] AI image generation successful!")
-                instagram_image = self._format_for_instagram(ai_image, content_data, style)
-            else:
-                print(f"🎨 [FALLBACK] Using enhanced text-based generation...")
-                instagram_image = self._create_enhanced_poster(content_data, trend_data, style)
-            
-            # Save image
-            saved_path = self._save_image(instagram_image, f"{style}_ai_generated")
-            
-            print(f"🎉 [SUCCESS] Image generation completed!")
-            print(f"📁 [SUCCESS] Saved to: {saved_path}")
+            saved_path = self._compose_and_save(content_data, trend_data, style, ai_image, fmt)
             
             return saved_path
             
         except Exception as e:
-            print(f"❌ [ERROR] Image generation failed: {e}")
             logger.error(f"Image generation failed: {e}")
-            return self._create_fallback_image(content_data, style)
+            return self._create_fallback_image(content_data, style, fmt)
     
     def _create_ai_prompt(self, content_data: Dict[str, Any], 
                          trend_data: Optional[Dict[str, Any]], 
                          style: str) -> str:
         """AI image generation için prompt oluştur"""
         
-        visual_summary = content_data.get('visual_summary', 'amazing content')
-        keywords = content_data.get('keywords', [])
-        
-        # Style-based prompt
-        style_prompts = {
-            "modern": "modern minimalist design, clean aesthetics, professional layout",
-            "gaming": "gaming aesthetic, neon colors, futuristic design, cyberpunk style",
-            "minimal": "minimal design, white background, clean typography",
-            "trendy": "trendy social media design, vibrant colors, instagram style"
-        }
-        
-        style_desc = style_prompts.get(style, style_prompts["modern"])
-        keywords_text = ", ".join(keywords[:5]) if keywords else ""
-        
-        prompt = f"{style_desc}, {visual_summary}, {keywords_text}, high quality, digital art, social media ready"
-        
-        return prompt
+        return _build_prompt(style,
+                             content_data.get('visual_summary', 'amazing content'),
+                             tuple(content_data.get('keywords', [])[:5]))
+    
+    def generate_instagram_images(self, items: List[Tuple[Dict[str, Any], Optional[Dict[str, Any]], str]],
+                                  output_format: str = "WEBP") -> List[str]:
+        """
+        Birden fazla (content_data, trend_data, style) için toplu üretim.
+        AI'ya tek istekte gidilir; poster çizimi ve kayıt thread pool'da paralel yürür
+        (Pillow resize/draw/encode sırasında GIL'i bırakır).
+        """
+        fmt = _output_format(output_format)
+        prompts = [self._create_ai_prompt(content_data, trend_data, style)
+                   for content_data, trend_data, style in items]
+        ai_images = self._try_ai_generation_batch(prompts)
+        
+        futures = [
+            self._executor.submit(self._compose_and_save_safe, content_data, trend_data, style, ai_image, fmt)
+            for (content_data, trend_data, style), ai_image in zip(items, ai_images)
+        ]
+        return [future.result() for future in futures]
+    
+    def _compose_and_save(self, content_data: Dict[str, Any], 
+                          trend_data: Optional[Dict[str, Any]], 
+                          style: str, ai_image: Optional[Image.Image], fmt: str = "WEBP") -> str:
+        """AI görselini formatla ya da enhanced poster çiz, sonra kaydet"""
+        if ai_image:
+            _dbg("🤖 [AI] AI image generation successful")
+            instagram_image = self._format_for_instagram(ai_image, content_data, style)
+        else:
+            _dbg("🎨 [FALLBACK] Using enhanced text-based generation")
+            instagram_image = self._create_enhanced_poster(content_data, trend_data, style)
+        
+        # Save image
+        return self._save_image(instagram_image, f"{style}_ai_generated", fmt)
+    
+    def _compose_and_save_safe(self, content_data: Dict[str, Any], 
+                               trend_data: Optional[Dict[str, Any]], 
+                               style: str, ai_image: Optional[Image.Image], fmt: str = "WEBP") -> str:
+        """Batch işçisi - tek bir öğenin hatası diğerlerini düşürmesin"""
+        try:
+            return self._compose_and_save(content_data, trend_data, style, ai_image, fmt)
+        except Exception as e:
+            logger.error(f"Image generation failed: {e}")
+            return self._create_fallback_image(content_data, style, fmt)
     
     def _try_ai_generation(self, prompt: str) -> Optional[Image.Image]:
         """AI image generation denemesi - placeholder"""
+        return self._try_ai_generation_batch([prompt])[0]
+    
+    def _try_ai_generation_batch(self, prompts: List[str]) -> List[Optional[Image.Image]]:
+        """Prompt listesi için tek AI isteği - placeholder, başarısız öğeler None"""
         
-        print(f"🤖 [AI] Attempting AI image generation...")
-        print(f"📝 [AI] Prompt: {prompt}")
+        _dbg("🤖 [AI] Attempting AI image generation for %d prompt(s)", len(prompts))
         
-        # Bu kısımda gerçek AI API'si kullanılabilir
+        # Bu kısımda gerçek AI API'si kullanılabilir (prompt'lar tek batch istekte gönderilir)
         # Şimdilik None döndürüp fallback'e geçiyoruz
         
         try:
             # Placeholder - burada gerçek AI API çağrısı olacak
             # Örnek: DALL-E, Midjourney API, vs.
             
-            print(f"⚠️ [AI] AI service not configured, using fallback")
-            return None
+            _dbg("⚠️ [AI] AI service not configured, using fallback")
+            return [None] * len(prompts)
             
         except Exception as e:
-            print(f"❌ [AI] AI generation failed: {e}")
-            return None
+            logger.warning(f"AI generation failed: {e}")
+            return [None] * len(prompts)
     
     def _create_enhanced_poster(self, content_data: Dict[str, Any], 
                                trend_data: Optional[Dict[str, Any]], 
                                style: str) -> Image.Image:
         """Enhanced text-based poster - gerçek tasarım ile"""
         
-        print(f"🎨 [ENHANCED] Creating enhanced poster...")
-        
-        # Style-based colors
-        color_schemes = {
-            "modern": {
-                "bg": "#1a1a1a", "primary": "#FF6B6B", "secondary": "#4ECDC4", 
-                "text": "#FFFFFF", "accent": "#FFE66D"
-            },
-            "gaming": {
-                "bg": "#0D1117", "primary": "#FF0080", "secondary": "#00D9FF", 
-                "text": "#FFFFFF", "accent": "#FFFF00"
-            },
-            "minimal": {
-                "bg": "#F8F9FA", "primary": "#2C3E50", "secondary": "#3498DB", 
-                "text": "#2C3E50", "accent": "#E74C3C"
-            },
-            "trendy": {
-                "bg": "#FF6B6B", "primary": "#FFFFFF", "secondary": "#FFE66D", 
-                "text": "#2C3E50", "accent": "#6BB6FF"
-            }
-        }
-        
-        colors = color_schemes.get(style, color_schemes["modern"])
-        
-        # Create image with gradient background
-        img = self._create_gradient_background(colors["bg"], colors["secondary"])
+        colors = _COLOR_SCHEMES.get(style, _COLOR_SCHEMES["modern"])
+        
+        # Sabit katmanlar (gradient, kutular, emoji, branding) style başına bir kez çizilir
+        img = self._style_template(style).copy()
         draw = ImageDraw.Draw(img)
         
         # Title from content
         title = self._extract_smart_title(content_data)
-        print(f"📝 [ENHANCED] Title: {title}")
+        _dbg("📝 [ENHANCED] Title: %s", title)
         
         # Enhanced layout
-        self._draw_enhanced_layout(draw, title, content_data, colors, style)
+        self._draw_enhanced_layout(img, draw, title, content_data, colors, style)
         
         return img
     
-    def _create_gradient_background(self, color1: str, color2: str) -> Image.Image:
-        """Gradient background oluştur"""
-        
-        img = Image.new('RGB', self.poster_size, color=color1)
-        
-        # Simple gradient effect
-        draw = ImageDraw.Draw(img)
-        
-        # Convert hex to RGB
-        def hex_to_rgb(hex_color):
-            hex_color = hex_color.lstrip('#')
-            return tuple(int(hex_color[i:i+2], 16) for i in (0, 2, 4))
-        
-        rgb1 = hex_to_rgb(color1)
-        rgb2 = hex_to_rgb(color2)
-        
-        # Create gradient
-        for y in range(self.poster_size[1]):
-            ratio = y / self.poster_size[1]
-            r = int(rgb1[0] * (1 - ratio) + rgb2[0] * ratio)
-            g = int(rgb1[1] * (1 - ratio) + rgb2[1] * ratio)
-            b = int(rgb1[2] * (1 - ratio) + rgb2[2] * ratio)
+    def _style_template(self, style: str) -> Image.Image:
+        """Style'a bağlı statik poster katmanı - sadece dinamik metin her istekte çizilir"""
+        template = self._templates.get(style)
+        if template is None:
+            colors = _COLOR_SCHEMES.get(style, _COLOR_SCHEMES["modern"])
+            arr = self._gradient_array(colors["bg"], colors["secondary"])
+            
+            # Header, content ve footer arka planları - doğrudan buffer'a slice yazımı
+            _fill_box(arr, (50, 100, 1030, 250), colors["primary"], colors["accent"], 3)
+            _fill_box(arr, (100, 300, 980, 500), colors["secondary"], colors["primary"], 2)
+            _fill_box(arr, (50, 850, 1030, 950), colors["primary"], colors["accent"], 2)
             
-            draw.line([(0, y), (self.poster_size[0], y)], fill=(r, g, b))
+            # Metin katmanı için Pillow
+            template = Image.fromarray(arr, 'RGB')
+            draw = ImageDraw.Draw(template)
+            
+            # Style indicator
+            emoji = _STYLE_EMOJI.get(style, "🎨")
+            self._draw_text_centered(draw, emoji, (100, 175), 60, colors["accent"])
+            
+            # Branding
+            self._draw_text_centered(draw, "AI Generated Instagram Content", (540, 1000), 20, colors["text"])
+            
+            self._templates[style] = template
+        return template
+    
+    def _gradient_array(self, color1: str, color2: str) -> np.ndarray:
+        """Gradient background oluştur - (H, W, 3) uint8 yazılabilir buffer"""
         
-        return img
+        rgb1 = np.array(_hex_to_rgb(color1), dtype=np.float32)
+        rgb2 = np.array(_hex_to_rgb(color2), dtype=np.float32)
+        
+        # Dikey gradient - satır renkleri bir kez hesaplanıp tüm genişliğe yayılır
+        width, height = self.poster_size
+        ratios = np.arange(height, dtype=np.float32)[:, None] / height
+        row = ((1 - ratios) * rgb1 + ratios * rgb2).astype(np.uint8)
+        return np.broadcast_to(row[:, None, :], (height, width, 3)).copy()
     
     def _extract_smart_title(self, content_data: Dict[str, Any]) -> str:
         """Akıllı başlık çıkarma"""
@@ -186,12 +293,10 @@ class SimpleImageGenerator:
         
         # Visual summary'den akıllı başlık
         if visual_summary:
-            words = visual_summary.split()
-            
             # İlk 3-4 anlamlı kelimeyi al
             meaningful_words = []
-            for word in words[:6]:
-                if len(word) > 3 and word.lower() not in ['ile', 'için', 'olan', 'bir', 'bu', 'şu']:
+            for word in visual_summary.split()[:6]:
+                if len(word) > 3 and word.lower() not in STOPWORDS:
                     meaningful_words.append(word.title())
                 if len(meaningful_words) >= 3:
                     break
@@ -205,7 +310,7 @@ class SimpleImageGenerator:
         
         return "AI Generated Content"
     
-    def _draw_enhanced_layout(self, draw, title: str, content_data: Dict[str, Any], 
+    def _draw_enhanced_layout(self, img: Image.Image, draw, title: str, content_data: Dict[str, Any], 
                              colors: dict, style: str):
         """Enhanced layout çizimi"""
         
@@ -218,40 +323,30 @@ class SimpleImageGenerator:
         # Keywords section
         keywords = content_data.get('keywords', [])
         if keywords:
-            self._draw_keywords_section(draw, keywords, colors)
+            self._draw_keywords_section(img, draw, keywords, colors)
         
         # Footer
         self._draw_footer_section(draw, content_data.get('hashtags', []), colors)
     
     def _draw_header_section(self, draw, title: str, colors: dict, style: str):
-        """Header section çiz"""
-        
-        # Background rectangle for title
-        draw.rectangle([(50, 100), (1030, 250)], fill=colors["primary"], outline=colors["accent"], width=3)
+        """Header section çiz (arka plan ve emoji style template'inde)"""
         
         # Title text
         self._draw_text_centered(draw, title, (540, 175), 48, colors["text"])
-        
-        # Style indicator
-        style_emoji = {"gaming": "🎮", "modern": "💼", "minimal": "✨", "trendy": "🔥"}
-        emoji = style_emoji.get(style, "🎨")
-        self._draw_text_centered(draw, emoji, (100, 175), 60, colors["accent"])
     
     def _draw_content_section(self, draw, content_data: Dict[str, Any], colors: dict):
         """Content section çiz"""
         
         visual_summary = content_data.get('visual_summary', 'Amazing content!')
         
-        # Content background
-        draw.rectangle([(100, 300), (980, 500)], fill=colors["secondary"], outline=colors["primary"], width=2)
-        
         # Wrapped text
         self._draw_wrapped_text(draw, visual_summary, (150, 350), 32, colors["text"], 780)
     
-    def _draw_keywords_section(self, draw, keywords: List[str], colors: dict):
+    def _draw_keywords_section(self, img: Image.Image, draw, keywords: List[str], colors: dict):
         """Keywords section çiz"""
         
         y_start = 550
+        badge = _badge_sprite(colors["accent"], colors["primary"])
         
         for i, keyword in enumerate(keywords[:6]):
             col = i % 3
@@ -260,36 +355,30 @@ class SimpleImageGenerator:
             x = 200 + col * 280
             y = y_start + row * 80
             
-            # Keyword badge
-            draw.rounded_rectangle([(x-60, y-25), (x+60, y+25)], radius=15, 
-                                 fill=colors["accent"], outline=colors["primary"], width=2)
+            # Keyword badge - hazır sprite alfa maskesiyle yapıştırılır
+            img.paste(badge, (x-60, y-25), badge)
             
             self._draw_text_centered(draw, f"#{keyword}", (x, y), 20, colors["text"])
     
     def _draw_footer_section(self, draw, hashtags: List[str], colors: dict):
-        """Footer section çiz"""
-        
-        # Footer background
-        draw.rectangle([(50, 850), (1030, 950)], fill=colors["primary"], outline=colors["accent"], width=2)
+        """Footer section çiz (arka plan ve branding style template'inde)"""
         
         # Hashtags
         hashtag_text = " ".join([f"#{tag}" for tag in hashtags[:8]])
         self._draw_wrapped_text(draw, hashtag_text, (100, 875), 24, colors["text"], 830)
-        
-        # Branding
-        self._draw_text_centered(draw, "AI Generated Instagram Content", (540, 1000), 20, colors["text"])
     
     def _draw_text_centered(self, draw, text: str, position: tuple, size: int, color: str):
         """Centered text çiz"""
+        font = _get_font(size)
         try:
-            bbox = draw.textbbox((0, 0), text)
+            bbox = draw.textbbox((0, 0), text, font=font)
             text_width = bbox[2] - bbox[0]
             text_height = bbox[3] - bbox[1]
             
             x = position[0] - text_width // 2
             y = position[1] - text_height // 2
             
-            draw.text((x, y), text, fill=color)
+            draw.text((x, y), text, fill=color, font=font)
         except Exception:
             draw.text(position, text[:30], fill=color)
     
@@ -299,24 +388,33 @@ class SimpleImageGenerator:
         lines = []
         current_line = []
         
+        # Satır genişliği cache'li kelime genişliklerinin toplamı - test string'i kurulmaz
+        space_width = _word_width(' ', size)
+        current_width = 0
         for word in words:
-            test_line = ' '.join(current_line + [word])
-            if len(test_line) * (size * 0.6) <= max_width:  # Rough estimate
+            word_width = _word_width(word, size)
+            test_width = current_width + space_width + word_width if current_line else word_width
+            
+            if test_width <= max_width:
                 current_line.append(word)
+                current_width = test_width
+            elif current_line:
+                lines.append(' '.join(current_line))
+                current_line = [word]
+                current_width = word_width
             else:
-                if current_line:
-                    lines.append(' '.join(current_line))
-                    current_line = [word]
+                lines.append(word)
         
         if current_line:
             lines.append(' '.join(current_line))
         
         # Draw lines
+        font = _get_font(size)
         y_offset = 0
         line_height = size + 8
         
         for line in lines[:4]:  # Max 4 lines
-            draw.text((position[0], position[1] + y_offset), line, fill=color)
+            draw.text((position[0], position[1] + y_offset), line, fill=color, font=font)
             y_offset += line_height
     
     def _format_for_instagram(self, base_image: Image.Image, 
@@ -324,8 +422,19 @@ class SimpleImageGenerator:
                              style: str) -> Image.Image:
         """AI image'i Instagram formatına dönüştür"""
         
-        # Instagram square format
-        instagram_img = Image.new('RGB', self.poster_size, color='white')
+        # Instagram square format - hazır beyaz canvas'ın kopyası (memcpy, yeniden fill yok)
+        instagram_img = self._white_canvas.copy()
+        
+        # JPEG dosyasında libjpeg decode sırasında DCT ölçekleme ile küçültsün. draft() image'i
+        # yerinde değiştirir - çağıranın nesnesine değil, dosyadan bizim açtığımız kopyaya uygulanır
+        if base_image.format == "JPEG" and getattr(base_image, "filename", ""):
+            base_image = Image.open(base_image.filename)
+            base_image.draft('RGB', (800, 800))
+        
+        # Büyük girdiler önce ucuz BOX filtre ile hedefin 2 katına, son adım LANCZOS
+        w, h = base_image.size
+        if max(w, h) > 1600:
+            base_image = base_image.resize((min(w, 1600), min(h, 1600)), Image.Resampling.BOX)
         
         # Base image'i resize et
         base_image = base_image.resize((800, 800), Image.Resampling.LANCZOS)
@@ -345,61 +454,40 @@ class SimpleImageGenerator:
         
         return instagram_img
     
-    def _extract_smart_title(self, content_data: Dict[str, Any]) -> str:
-        """Smart title extraction"""
-        
-        visual_summary = content_data.get('visual_summary', '')
-        keywords = content_data.get('keywords', [])
-        
-        if visual_summary:
-            words = visual_summary.split()[:4]
-            if len(words) >= 2:
-                return ' '.join(words).title()
-        
-        if keywords:
-            return ' '.join(keywords[:3]).title()
-        
-        return "Generated Content"
-    
-    def _create_fallback_image(self, content_data: Dict[str, Any], style: str) -> str:
+    def _create_fallback_image(self, content_data: Dict[str, Any], style: str, fmt: str = "WEBP") -> str:
         """Simple fallback image"""
         
-        print(f"🔄 [FALLBACK] Creating simple fallback image...")
-        
         img = Image.new('RGB', self.poster_size, color='#3498DB')
         draw = ImageDraw.Draw(img)
         
         title = self._extract_smart_title(content_data)
         self._draw_text_centered(draw, title, (540, 540), 60, 'white')
         
-        return self._save_image(img, f"{style}_fallback")
+        return self._save_image(img, f"{style}_fallback", fmt)
     
-    def _save_image(self, img: Image.Image, prefix: str) -> str:
-        """Image'i tmp klasörüne kaydet"""
+    def _save_image(self, img: Image.Image, prefix: str, fmt: str = "WEBP") -> str:
+        """
+        Image'i tmp klasörüne kaydet.
+        fmt="WEBP": lossy quality 85, method 4; fmt="JPEG": quality 90, optimize pass yok;
+        fmt="PNG": kayıpsız, zlib level 1
+        """
         try:
-            # tmp directory
-            tmp_dir = os.path.join(os.path.dirname(__file__), "..", "tmp")
-            os.makedirs(tmp_dir, exist_ok=True)
-            
-            # Unique filename
-            timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-            unique_id = str(uuid.uuid4())[:8]
-            filename = f"{prefix}_{timestamp}_{unique_id}.png"
-            filepath = os.path.join(tmp_dir, filename)
+            # Unique filename - ns timestamp + 4 byte rastgele suffix
+            filename = f"{prefix}_{time.time_ns()}_{os.urandom(4).hex()}.{_EXTENSIONS[fmt]}"
+            filepath = os.path.join(self._tmp_dir, filename)
             
-            # Save with high quality
-            img.save(filepath, "PNG", quality=95, optimize=True)
-            
-            print(f"🖼️ [SAVE] Image saved: {filename}")
-            print(f"📁 [SAVE] Location: {tmp_dir}")
-            print(f"📏 [SAVE] Size: {img.size[0]}x{img.size[1]} pixels")
+            if fmt == "WEBP":
+                img.save(filepath, "WEBP", quality=85, method=4)
+            elif fmt == "PNG":
+                img.save(filepath, "PNG", compress_level=1)
+            else:
+                img.save(filepath, fmt, quality=90, optimize=False, progressive=True)
             
-            logger.info(f"Image saved: {filename}")
+            _dbg("🖼️ [SAVE] Image saved: %s (%dx%d)", filepath, img.size[0], img.size[1])
             
             return filepath
             
         except Exception as e:
-            print(f"❌ [SAVE] Save failed: {e}")
             logger.error(f"Failed to save image: {e}")
             raise
 
@@ -1,32 +1,171 @@
 import os
+import re
+import glob
+import mmap
 import uuid
+import time
+import threading
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime
 from typing import Dict, Any, List, Optional
 import logging
+import numpy as np
 from dotenv import load_dotenv
 
 # PIL imports (always needed)
 from PIL import Image, ImageDraw, ImageFont
 
+# CUDA caching allocator ayarı torch import edilmeden önce yapılmalı:
+# büyük blokların bölünmesini sınırla, istek boyutlarını 2'nin kuvveti aralıklarına yuvarla
+os.environ.setdefault("PYTORCH_CUDA_ALLOC_CONF", "max_split_size_mb:128,roundup_power2_divisions:4")
+
 # Stable Diffusion imports (optional)
 try:
-    from diffusers import StableDiffusionPipeline
+    from diffusers import StableDiffusionPipeline, DPMSolverMultistepScheduler
+    from diffusers.utils import is_xformers_available
     import torch
     DIFFUSION_AVAILABLE = True
 except ImportError as e:
     print(f"⚠️ Stable Diffusion not available: {e}")
     StableDiffusionPipeline = None
+    DPMSolverMultistepScheduler = None
+    is_xformers_available = None
     torch = None
     DIFFUSION_AVAILABLE = False
 
 load_dotenv()
 logger = logging.getLogger(__name__)
+# Request başına debug logları - format maliyeti sadece DEBUG açıksa ödenir
+_dbg = logger.debug
+
+NEGATIVE_PROMPT = "blurry, low quality, distorted, text, watermark, signature, ugly, bad anatomy, extra limbs, deformed"
+
+# Prompt zenginleştirme tabloları - terimler metin içinde alt-string olarak aranır
+_VISUAL_MAPPING = {
+    'mobile': 'smartphone interface, mobile app design',
+    'game': 'game interface, interactive elements, game graphics',
+    'puzzle': 'puzzle pieces, geometric patterns, brain teaser elements',
+    'colorful': 'vibrant colors, rainbow palette, bright hues',
+    'dark': 'dark theme, shadows, moody lighting',
+    'bright': 'bright lighting, illuminated, glowing effects',
+    'modern': 'contemporary design, sleek elements',
+    'retro': 'vintage style, retro aesthetics',
+    'nature': 'natural elements, organic shapes',
+    'technology': 'tech elements, digital interface, futuristic'
+}
+
+_VISUAL_TERMS = (
+    'color', 'bright', 'dark', 'neon', 'glow', 'shine',
+    'game', 'app', 'interface', 'design', 'art',
+    'mobile', 'digital', 'tech', 'modern', 'retro',
+    'puzzle', 'pattern', 'shape', 'geometric'
+)
+
+_VISUAL_TRENDS = {
+    'gaming': 'gaming aesthetics',
+    'mobile': 'mobile design',
+    'retro': 'retro style',
+    'neon': 'neon effects',
+    'minimal': 'minimalist design',
+}
+
+_COLOR_SCHEMES = (
+    (('gaming', 'neon', 'cyber'), "neon blue and pink"),
+    (('nature', 'green', 'organic'), "natural green and earth tones"),
+    (('minimal', 'clean', 'white'), "monochromatic white and gray"),
+    (('warm', 'orange', 'sunset'), "warm orange and yellow"),
+    (('cool', 'blue', 'ocean'), "cool blue and teal"),
+    (('dark', 'black', 'shadow'), "dark theme with accent colors"),
+    (('colorful', 'rainbow', 'vibrant'), "vibrant multicolor"),
+)
+
+
+def _term_regex(terms) -> re.Pattern:
+    """Terimlerden tek alternation regex'i - lookahead ile çakışan eşleşmeler de yakalanır"""
+    return re.compile("(?=(%s))" % "|".join(map(re.escape, terms)))
+
+
+def _find_terms(pattern: re.Pattern, text: str) -> set:
+    """Metinde geçen tüm terimler - tek tarama"""
+    return set(pattern.findall(text))
+
+
+_VISUAL_MAPPING_RE = _term_regex(_VISUAL_MAPPING)
+_VISUAL_TERMS_RE = re.compile("|".join(map(re.escape, _VISUAL_TERMS)))
+_VISUAL_TRENDS_RE = _term_regex(_VISUAL_TRENDS)
+_COLOR_TERMS_RE = _term_regex(term for terms, _ in _COLOR_SCHEMES for term in terms)
+
+# Poster metinleri için TrueType font (Dockerfile'da fonts-dejavu-core kurulur)
+FONT_PATH = os.getenv("POSTER_FONT", "DejaVuSans.ttf")
+
+# Poster'daki görsel alanı (px) - VAE doğrudan bu boyutta decode eder
+POSTER_IMAGE_SIZE = 800
+
+# from_pretrained öncesi safetensors shard'larını page cache'e paralel okuma
+PREFETCH_WEIGHTS = os.getenv("SD_PREFETCH_WEIGHTS", "1") == "1"
+
+
+def _select_dtype(device: str) -> "torch.dtype":
+    """
+    GPU'da yarı hassasiyet: Ampere+ için BF16 (FP32 ile aynı exponent aralığı, attention
+    softmax'ta FP16 overflow'u / siyah görsel yok), diğerleri FP16; CPU'da FP32
+    """
+    if device != "cuda":
+        return torch.float32
+    if torch.cuda.get_device_capability()[0] >= 8:
+        return torch.bfloat16
+    return torch.float16
+
+
+def _prefetch_weights(model_id: str, variant: Optional[str] = None) -> str:
+    """
+    Modelin gerekli dosyalarını indir ve safetensors shard'larını MAP_POPULATE ile
+    eşzamanlı mmap'leyerek page cache'e al. Yerel snapshot yolunu döner;
+    herhangi bir hata olursa model_id'ye düşülür (diffusers kendisi indirir).
+    """
+    if not PREFETCH_WEIGHTS:
+        return model_id
+    try:
+        from huggingface_hub import snapshot_download
+        
+        suffix = f".{variant}.safetensors" if variant else ".safetensors"
+        snapshot_dir = snapshot_download(
+            model_id,
+            allow_patterns=["*.json", "*.txt", f"*/diffusion_pytorch_model{suffix}", f"*/model{suffix}"],
+            # Pipeline safety_checker/feature_extractor=None ile yüklenir
+            ignore_patterns=["safety_checker/*", "feature_extractor/*"],
+        )
+        shards = glob.glob(os.path.join(snapshot_dir, "*", f"*{suffix}"))
+        if shards:
+            with ThreadPoolExecutor(max_workers=len(shards)) as pool:
+                list(pool.map(_populate_page_cache, shards))
+        return snapshot_dir
+    except Exception as e:
+        logger.warning(f"Weight prefetch failed, loading {model_id} directly: {e}")
+        return model_id
+
+
+def _populate_page_cache(path: str):
+    """Dosyayı MAP_POPULATE ile map'le - kernel tüm sayfaları okuyup cache'e alır"""
+    with open(path, "rb") as fh:
+        mapped = mmap.mmap(fh.fileno(), 0, prot=mmap.PROT_READ,
+                           flags=mmap.MAP_SHARED | getattr(mmap, "MAP_POPULATE", 0))
+        mapped.close()
+
 
 class StableDiffusionImageGenerator:
     def __init__(self):
         self.pipeline = None
         self.device = "cuda" if torch and torch.cuda.is_available() else "cpu"
         self.poster_size = (1080, 1080)  # Instagram square format
+        # (prompt, negative_prompt) -> (prompt_embeds, negative_prompt_embeds) (LRU)
+        self._embeds_cache = OrderedDict()
+        self._embeds_lock = threading.Lock()
+        # size -> FreeTypeFont; her text çağrısında yeniden yüklenmesin
+        self._font_cache = {}
+        # Yeniden kullanılan 1080x1080 canvas buffer'ı (thread başına)
+        self._scratch = threading.local()
         self._setup_pipeline()
         
     def _setup_pipeline(self):
@@ -60,42 +199,70 @@ class StableDiffusionImageGenerator:
             
             # Pipeline configuration
             pipeline_config = {
-                "torch_dtype": torch.float16 if self.device == "cuda" else torch.float32,
+                "torch_dtype": _select_dtype(self.device),
                 "safety_checker": None,  # Hız için devre dışı
+                "feature_extractor": None,  # Sadece safety checker kullanır - yüklenmesin
                 "requires_safety_checker": False,
                 "use_safetensors": True  # Safer format
             }
+            if self.device == "cuda":
+                # FP16 ağırlıklar doğrudan indirilir/okunur - FP32 okuyup cast etmekten yarı I/O
+                # (BF16'da yükleme sırasında FP16 -> BF16 cast edilir)
+                pipeline_config["variant"] = "fp16"
             
             print(f"⚙️ [SETUP] Pipeline config:")
             for key, value in pipeline_config.items():
                 print(f"   • {key}: {value}")
             
             # Load pipeline
-            import time
             load_start = time.time()
             
+            # Shard'ları paralel okuyup page cache'i ısıt; diffusers yerel snapshot'tan yükler
+            model_path = _prefetch_weights(model_id, pipeline_config.get("variant"))
+            
             self.pipeline = StableDiffusionPipeline.from_pretrained(
-                model_id,
+                model_path,
                 **pipeline_config
             )
             
             load_time = time.time() - load_start
             print(f"📥 [SETUP] Model loaded in {load_time:.1f} seconds")
             
+            # DPM-Solver++ ~15 adımda PNDM'nin 25 adımlık kalitesine ulaşır
+            self.pipeline.scheduler = DPMSolverMultistepScheduler.from_config(self.pipeline.scheduler.config)
+            
             # Move to device and optimize
             if self.device == "cuda":
                 print(f"🚀 [SETUP] Moving pipeline to CUDA...")
                 self.pipeline = self.pipeline.to("cuda")
                 
+                # NHWC layout - UNet/VAE conv'ları cuDNN'in FP16 tensor core kernel'lerine gider
+                self.pipeline.unet.to(memory_format=torch.channels_last)
+                self.pipeline.vae.to(memory_format=torch.channels_last)
+                
                 print(f"🔧 [SETUP] Enabling optimizations...")
-                # Memory optimization
-                self.pipeline.enable_attention_slicing()
+                # Ampere+ GPU'larda conv/matmul için TF32 tensor core'ları, sabit shape için cuDNN autotune
+                torch.backends.cuda.matmul.allow_tf32 = True
+                torch.backends.cudnn.allow_tf32 = True
+                torch.backends.cudnn.benchmark = True
+                
+                # 8 GB+ VRAM'de xformers memory-efficient attention, yoksa dense attention;
+                # slicing sadece düşük VRAM'de (throughput kaybı 8 GB+ kartlarda gereksiz)
+                total_memory = torch.cuda.get_device_properties(0).total_memory
+                if total_memory < 8 * 1024 ** 3:
+                    self.pipeline.enable_attention_slicing("auto")
+                    print(f"💾 [SETUP] Attention slicing enabled")
+                elif is_xformers_available():
+                    try:
+                        self.pipeline.unet.enable_xformers_memory_efficient_attention()
+                        print(f"✅ [SETUP] xFormers memory efficient attention enabled")
+                    except Exception as opt_e:
+                        print(f"⚠️ [SETUP] xFormers attention failed, using default attention: {opt_e}")
                 
-                try:
-                    self.pipeline.enable_memory_efficient_attention()
-                    print(f"✅ [SETUP] Memory efficient attention enabled")
-                except Exception as opt_e:
-                    print(f"⚠️ [SETUP] Memory efficient attention failed: {opt_e}")
+                # Sabit 512x512 shape - UNet'i CUDA graph'lı derle (PyTorch 2.0+)
+                if hasattr(torch, "compile"):
+                    self.pipeline.unet = torch.compile(self.pipeline.unet, mode="reduce-overhead", fullgraph=False)
+                    print(f"⚡ [SETUP] UNet compiled (reduce-overhead)")
                 
                 # Check VRAM usage
                 if torch.cuda.is_available():
@@ -127,6 +294,25 @@ class StableDiffusionImageGenerator:
             
             print(f"🔄 [SETUP] Will use fallback text-based generation")
     
+    def _warmup(self):
+        """
+        Kısa dummy generation ile UNet derlemesini ve cuDNN autotune'u ilk istekten önce tetikle.
+        reduce-overhead mode CUDA graph'ı ikinci çağrıda yakalar.
+        """
+        if self.pipeline is None or self.device != "cuda":
+            return
+        
+        try:
+            print(f"🔥 [SETUP] Pipeline warmup...")
+            with torch.inference_mode():
+                for _ in range(2):
+                    self.pipeline("warmup", height=512, width=512, num_inference_steps=2,
+                                  output_type="latent")
+            print(f"✅ [SETUP] Warmup completed")
+        except Exception as e:
+            print(f"⚠️ [SETUP] Warmup failed: {e}")
+            logger.warning(f"Pipeline warmup failed: {e}")
+    
     def generate_instagram_image(self, 
                                 content_data: Dict[str, Any],
                                 trend_data: Optional[Dict[str, Any]] = None,
@@ -136,65 +322,43 @@ class StableDiffusionImageGenerator:
         Returns: saved image file path
         """
         try:
-            print(f"\n🚀 [MAIN] Starting Instagram image generation...")
-            print(f"🎨 [MAIN] Style: {style}")
-            print(f"📊 [MAIN] Pipeline available: {self.pipeline is not None}")
-            print(f"🔧 [MAIN] Device: {self.device}")
-            
             # Input data debug
-            print(f"\n📋 [INPUT] Content Data:")
-            print(f"   • Visual Summary: {content_data.get('visual_summary', 'N/A')}")
-            print(f"   • Keywords: {content_data.get('keywords', [])}")
-            print(f"   • Hashtags: {content_data.get('hashtags', [])}")
-            
-            if trend_data:
-                print(f"📈 [INPUT] Trend Data:")
-                print(f"   • Trends: {trend_data.get('trends', [])}")
-                print(f"   • Trend Hashtags: {trend_data.get('hashtags', [])}")
-            else:
-                print(f"📈 [INPUT] No trend data provided")
+            if logger.isEnabledFor(logging.DEBUG):
+                _dbg("🚀 [MAIN] Style: %s, pipeline available: %s, device: %s",
+                     style, self.pipeline is not None, self.device)
+                _dbg("📋 [INPUT] Visual summary: %s", content_data.get('visual_summary', 'N/A'))
+                _dbg("📋 [INPUT] Keywords: %s, hashtags: %s",
+                     content_data.get('keywords', []), content_data.get('hashtags', []))
+                if trend_data:
+                    _dbg("📈 [INPUT] Trends: %s, trend hashtags: %s",
+                         trend_data.get('trends', []), trend_data.get('hashtags', []))
             
             # Prompt oluştur
-            print(f"\n🔄 [PROMPT] Creating enhanced prompt...")
             prompt = self._create_prompt(content_data, trend_data, style)
-            print(f"📝 [PROMPT] Final prompt length: {len(prompt)} characters")
             
             if self.pipeline:
-                print(f"\n🤖 [PIPELINE] Using Stable Diffusion pipeline...")
-                
                 # Stable Diffusion ile görsel üret
-                print(f"🎨 [GENERATION] Starting Stable Diffusion generation...")
                 image = self._generate_with_diffusion(prompt)
                 
-                print(f"✅ [GENERATION] Raw image generated: {image.size}")
-                
                 # Instagram formatına dönüştür
-                print(f"📱 [FORMAT] Converting to Instagram format...")
                 instagram_image = self._format_for_instagram(image, content_data, style)
-                print(f"✅ [FORMAT] Instagram format ready: {instagram_image.size}")
                 
             else:
-                print(f"⚠️ [FALLBACK] Pipeline not available, using text-based poster...")
+                _dbg("⚠️ [FALLBACK] Pipeline not available, using text-based poster")
                 # Fallback: Text-based poster
                 instagram_image = self._create_text_poster(content_data, style)
             
             # Kaydet ve döndür
-            print(f"💾 [SAVE] Saving image to tmp directory...")
             saved_path = self._save_image(instagram_image, f"{style}_instagram")
             
-            print(f"🎉 [SUCCESS] Instagram image generation completed!")
-            print(f"📁 [SUCCESS] Saved to: {saved_path}")
+            # İstekler arası cache'lenmiş blokları bırak - fragmentasyon birikmesin
+            if self.device == "cuda":
+                torch.cuda.empty_cache()
             
             return saved_path
             
         except Exception as e:
-            print(f"\n❌ [ERROR] Image generation failed!")
-            print(f"❌ [ERROR] Error: {str(e)}")
-            print(f"❌ [ERROR] Error type: {type(e).__name__}")
-            
             logger.error(f"Image generation failed: {e}")
-            
-            print(f"🔄 [FALLBACK] Creating fallback image...")
             return self._create_fallback_image(content_data, style)
     
     def _create_prompt(self, content_data: Dict[str, Any], 
@@ -215,11 +379,6 @@ class StableDiffusionImageGenerator:
             trends = trend_data.get('trends', [])
             trend_hashtags = trend_data.get('hashtags', [])
         
-        print(f"🔍 [PROMPT] Visual Summary: {visual_summary}")
-        print(f"🔍 [PROMPT] Keywords: {keywords}")
-        print(f"🔍 [PROMPT] Trends: {trends}")
-        print(f"🔍 [PROMPT] Style: {style}")
-        
         # Style'a göre görsel tarzı
         style_prompts = {
             "modern": "modern minimalist design, clean aesthetics, professional layout, sleek interface,",
@@ -261,7 +420,7 @@ class StableDiffusionImageGenerator:
         
         final_prompt = ", ".join(prompt_parts)
         
-        print(f"✨ [PROMPT] Generated: {final_prompt[:100]}...")
+        _dbg("✨ [PROMPT] Generated (%d karakter): %s", len(final_prompt), final_prompt)
         
         return final_prompt
     
@@ -270,24 +429,9 @@ class StableDiffusionImageGenerator:
         
         combined_text = f"{visual_summary} {video_summary}".lower()
         
-        # Görsel öğeler sözlüğü
-        visual_mapping = {
-            'mobile': 'smartphone interface, mobile app design',
-            'game': 'game interface, interactive elements, game graphics',
-            'puzzle': 'puzzle pieces, geometric patterns, brain teaser elements',
-            'colorful': 'vibrant colors, rainbow palette, bright hues',
-            'dark': 'dark theme, shadows, moody lighting',
-            'bright': 'bright lighting, illuminated, glowing effects',
-            'modern': 'contemporary design, sleek elements',
-            'retro': 'vintage style, retro aesthetics',
-            'nature': 'natural elements, organic shapes',
-            'technology': 'tech elements, digital interface, futuristic'
-        }
-        
-        detected_elements = []
-        for keyword, visual_desc in visual_mapping.items():
-            if keyword in combined_text:
-                detected_elements.append(visual_desc)
+        # Tek regex taraması; sonuç sırası sözlük sırasıyla aynı kalır
+        found = _find_terms(_VISUAL_MAPPING_RE, combined_text)
+        detected_elements = [visual_desc for keyword, visual_desc in _VISUAL_MAPPING.items() if keyword in found]
         
         if detected_elements:
             return f"showing {', '.join(detected_elements[:3])}"
@@ -302,12 +446,7 @@ class StableDiffusionImageGenerator:
             keyword_lower = keyword.lower()
             
             # Görsel keyword'ler
-            if any(visual_term in keyword_lower for visual_term in [
-                'color', 'bright', 'dark', 'neon', 'glow', 'shine',
-                'game', 'app', 'interface', 'design', 'art',
-                'mobile', 'digital', 'tech', 'modern', 'retro',
-                'puzzle', 'pattern', 'shape', 'geometric'
-            ]):
+            if _VISUAL_TERMS_RE.search(keyword_lower):
                 visual_keywords.append(keyword)
             elif len(keyword) > 3:  # Genel keyword'ler
                 visual_keywords.append(keyword)
@@ -321,19 +460,10 @@ class StableDiffusionImageGenerator:
         for trend in trends:
             trend_lower = trend.lower()
             
-            # Görsel trend mapping
-            if 'gaming' in trend_lower:
-                visual_trends.append('gaming aesthetics')
-            elif 'mobile' in trend_lower:
-                visual_trends.append('mobile design')
-            elif 'retro' in trend_lower:
-                visual_trends.append('retro style')
-            elif 'neon' in trend_lower:
-                visual_trends.append('neon effects')
-            elif 'minimal' in trend_lower:
-                visual_trends.append('minimalist design')
-            else:
-                visual_trends.append(f"{trend} style")
+            # Görsel trend mapping - birden fazla eşleşmede tablo sırası öncelikli
+            found = _find_terms(_VISUAL_TRENDS_RE, trend_lower)
+            visual_trends.append(next((desc for term, desc in _VISUAL_TRENDS.items() if term in found),
+                                      f"{trend} style"))
         
         return visual_trends[:3]
     
@@ -342,30 +472,19 @@ class StableDiffusionImageGenerator:
         
         all_terms = ' '.join(keywords + trends + [style]).lower()
         
-        # Renk şeması mapping
-        if any(term in all_terms for term in ['gaming', 'neon', 'cyber']):
-            return "neon blue and pink"
-        elif any(term in all_terms for term in ['nature', 'green', 'organic']):
-            return "natural green and earth tones"
-        elif any(term in all_terms for term in ['minimal', 'clean', 'white']):
-            return "monochromatic white and gray"
-        elif any(term in all_terms for term in ['warm', 'orange', 'sunset']):
-            return "warm orange and yellow"
-        elif any(term in all_terms for term in ['cool', 'blue', 'ocean']):
-            return "cool blue and teal"
-        elif any(term in all_terms for term in ['dark', 'black', 'shadow']):
-            return "dark theme with accent colors"
-        elif any(term in all_terms for term in ['colorful', 'rainbow', 'vibrant']):
-            return "vibrant multicolor"
-        else:
-            # Style'a göre default
-            style_colors = {
-                'gaming': 'neon blue and purple',
-                'modern': 'blue and white',
-                'minimal': 'grayscale with blue accent',
-                'trendy': 'gradient pink and orange'
-            }
-            return style_colors.get(style, 'balanced color palette')
+        # Renk şeması mapping - ilk eşleşen grup kazanır
+        found = _find_terms(_COLOR_TERMS_RE, all_terms)
+        for terms, scheme in _COLOR_SCHEMES:
+            if not found.isdisjoint(terms):
+                return scheme
+        # Style'a göre default
+        style_colors = {
+            'gaming': 'neon blue and purple',
+            'modern': 'blue and white',
+            'minimal': 'grayscale with blue accent',
+            'trendy': 'gradient pink and orange'
+        }
+        return style_colors.get(style, 'balanced color palette')
     
     def _determine_composition(self, style: str, keywords: List[str]) -> str:
         """Kompozisyon öğelerini belirle"""
@@ -393,95 +512,110 @@ class StableDiffusionImageGenerator:
         """Stable Diffusion ile görsel üret - Detaylı debug ile"""
         
         try:
-            print(f"\n🎨 [DIFFUSION] Starting Stable Diffusion generation...")
-            print(f"🔧 [DIFFUSION] Device: {self.device}")
-            print(f"🤖 [DIFFUSION] Model: sd-legacy/stable-diffusion-v1-5")
-            print(f"📝 [DIFFUSION] Full Prompt: {prompt}")
-            
             # Generation parameters
+            prompt_embeds, negative_prompt_embeds = self._prompt_embeddings(prompt, NEGATIVE_PROMPT)
             generation_params = {
-                "prompt": prompt,
+                "prompt_embeds": prompt_embeds,
+                "negative_prompt_embeds": negative_prompt_embeds,
                 "height": 512,  # Stable Diffusion optimal size
                 "width": 512,
-                "num_inference_steps": 25,  # Biraz artırdık kalite için
-                "guidance_scale": 7.5,
+                "num_inference_steps": 15,  # DPM-Solver++ için yeterli
+                "guidance_scale": 7.0,
                 "num_images_per_prompt": 1,
-                "negative_prompt": "blurry, low quality, distorted, text, watermark, signature, ugly, bad anatomy, extra limbs, deformed"
+                "output_type": "latent",  # VAE decode aşağıda hedef boyutta yapılır
             }
             
-            print(f"⚙️ [DIFFUSION] Generation Parameters:")
-            for key, value in generation_params.items():
-                print(f"   • {key}: {value}")
+            _dbg("⏳ [DIFFUSION] Starting inference on %s (%d steps)",
+                 self.device, generation_params['num_inference_steps'])
             
-            print(f"\n⏳ [DIFFUSION] Starting inference ({generation_params['num_inference_steps']} steps)...")
-            
-            # Progress tracking için callback function
+            # Progress tracking - sadece DEBUG açıkken; aksi halde adım başına Python callback'i yok
             def progress_callback(step, timestep, latents):
-                progress = (step + 1) / generation_params['num_inference_steps'] * 100
-                print(f"   Step {step + 1}/{generation_params['num_inference_steps']} ({progress:.1f}%) - Timestep: {timestep}")
+                _dbg("   Step %d/%d - Timestep: %s", step + 1, generation_params['num_inference_steps'], timestep)
             
-            # Generate image with progress tracking
-            import time
-            start_time = time.time()
+            callback = progress_callback if logger.isEnabledFor(logging.DEBUG) else None
             
-            if self.device == "cuda" and torch.cuda.is_available():
-                print(f"🚀 [DIFFUSION] Using CUDA acceleration...")
-                with torch.autocast("cuda"):
-                    result = self.pipeline(
-                        **generation_params,
-                        callback=progress_callback,
-                        callback_steps=5  # Her 5 step'de progress göster
-                    )
-            else:
-                print(f"🐌 [DIFFUSION] Using CPU (slower)...")
-                result = self.pipeline(
-                    **generation_params,
-                    callback=progress_callback,
-                    callback_steps=5
-                )
+            # Generate image
+            start_time = time.time()
             
-            generation_time = time.time() - start_time
-            image = result.images[0]
+            # Ağırlıklar hedef dtype'ta (BF16/FP16/FP32) yüklü - autocast gerekmez
+            result = self.pipeline(
+                **generation_params,
+                callback=callback,
+                callback_steps=5  # Her 5 step'de progress göster
+            )
             
-            print(f"\n✅ [DIFFUSION] Generation completed successfully!")
-            print(f"⏱️ [DIFFUSION] Generation time: {generation_time:.2f} seconds")
-            print(f"📏 [DIFFUSION] Generated image size: {image.size}")
-            print(f"🎨 [DIFFUSION] Image mode: {image.mode}")
+            # CUDA'da 64x64 latent'i 100x100'e büyütüp doğrudan 800x800 decode et - CPU resize'ı yok.
+            # CPU/FP32'de 800² VAE decode 512²'den ~2.4x yavaş - 512 decode + resize daha ucuz
+            decode_size = POSTER_IMAGE_SIZE if self.device == "cuda" else 512
+            with torch.inference_mode():
+                image = self._decode_latents(result.images, decode_size)
             
-            # Image quality check
-            if hasattr(result, 'nsfw_content_detected'):
-                print(f"🔍 [DIFFUSION] NSFW check: {result.nsfw_content_detected}")
+            _dbg("✅ [DIFFUSION] Generated %s in %.2f seconds", image.size, time.time() - start_time)
             
             return image
             
-        except Exception as e:
-            print(f"\n❌ [DIFFUSION] Generation failed!")
-            print(f"❌ [DIFFUSION] Error: {str(e)}")
-            print(f"❌ [DIFFUSION] Error type: {type(e).__name__}")
-            
-            # Detailed error info
-            import traceback
-            print(f"❌ [DIFFUSION] Traceback:")
-            traceback.print_exc()
-            
+        except Exception:
+            logger.exception("Stable Diffusion generation failed")
             raise
     
+    def _prompt_embeddings(self, prompt: str, negative_prompt: str):
+        """
+        (prompt, negative_prompt) için CLIP text encoder çıktısı - tekrar eden prompt'larda
+        tokenization + encoder forward atlanır. Embedding'ler küçük (~120 KB), device'da tutulur.
+        """
+        key = (prompt, negative_prompt)
+        with self._embeds_lock:
+            cached = self._embeds_cache.get(key)
+            if cached is not None:
+                self._embeds_cache.move_to_end(key)
+                return cached
+        
+        with torch.inference_mode():
+            # diffusers 0.15: CFG açıkken [negative, positive] birleşik tensor döner
+            embeds = self.pipeline._encode_prompt(prompt, self.device, 1, True, negative_prompt)
+        negative_embeds, prompt_embeds = embeds.chunk(2)
+        
+        with self._embeds_lock:
+            self._embeds_cache[key] = (prompt_embeds, negative_embeds)
+            while len(self._embeds_cache) > 128:
+                self._embeds_cache.popitem(last=False)
+        return prompt_embeds, negative_embeds
+    
+    def _decode_latents(self, latents, size: int) -> Image.Image:
+        """Latent'leri bilinear ile size/8'e büyüt ve VAE ile size x size görsele decode et"""
+        vae = self.pipeline.vae
+        if latents.shape[-1] != size // 8:
+            latents = torch.nn.functional.interpolate(latents, size=(size // 8, size // 8), mode="bilinear")
+        image = vae.decode(latents.to(vae.dtype) / vae.config.scaling_factor).sample
+        image = (image / 2 + 0.5).clamp(0, 1).mul(255).round().to(torch.uint8)
+        # Tek D2H kopya (800x800x3 uint8 ~1.9 MB) - fromarray hemen ihtiyaç duyduğu için senkron
+        return Image.fromarray(image[0].permute(1, 2, 0).contiguous().cpu().numpy())
+    
     def _format_for_instagram(self, base_image: Image.Image, 
                              content_data: Dict[str, Any], 
                              style: str) -> Image.Image:
         """Üretilen görseli Instagram formatına dönüştür"""
         
-        # Instagram square format (1080x1080)
-        instagram_img = Image.new('RGB', self.poster_size, color='white')
-        
-        # Base image'i resize et ve merkeze yerleştir
-        base_image = base_image.resize((800, 800), Image.Resampling.LANCZOS)
+        # Base image'i resize et ve merkeze yerleştir (CUDA'da diffusion çıktısı zaten 800x800 decode edilir)
+        if base_image.size != (800, 800):
+            base_image = base_image.resize((800, 800), Image.Resampling.BILINEAR)
+        if base_image.mode != 'RGB':
+            base_image = base_image.convert('RGB')
         
         # Merkeze yerleştir
         x = (self.poster_size[0] - 800) // 2
         y = (self.poster_size[1] - 800) // 2 - 50  # Biraz yukarı kaydır
         
-        instagram_img.paste(base_image, (x, y))
+        # Instagram square format (1080x1080) - thread başına bir kez beyazla doldurulan canvas;
+        # sadece görsel alanı yeniden yazılır, kenar boşlukları hep beyaz kalır
+        canvas = getattr(self._scratch, "canvas", None)
+        if canvas is None:
+            width, height = self.poster_size
+            canvas = self._scratch.canvas = np.full((height, width, 3), 255, dtype=np.uint8)
+        canvas[y:y + 800, x:x + 800] = np.asarray(base_image)
+        
+        # fromarray RGB veriyi kopyalar - metin kopyaya çizilir, canvas temiz kalır
+        instagram_img = Image.fromarray(canvas)
         
         # Text overlay ekle
         draw = ImageDraw.Draw(instagram_img)
@@ -562,45 +696,58 @@ class StableDiffusionImageGenerator:
         return "Generated Content"
     
     def _draw_text_overlay(self, draw, text: str, position: tuple, size: int, color: str, center: bool = False):
-        """Text çiz"""
+        """Text çiz - center=True'da Pillow anchor'ı ortalar, Python'da bbox hesabı yok"""
         try:
-            if center:
-                bbox = draw.textbbox((0, 0), text)
-                text_width = bbox[2] - bbox[0]
-                text_height = bbox[3] - bbox[1]
-                x = position[0] - text_width // 2
-                y = position[1] - text_height // 2
-                draw.text((x, y), text, fill=color)
-            else:
-                draw.text(position, text, fill=color)
+            draw.text(position, text, fill=color, font=self._font(size), anchor="mm" if center else "la")
         except Exception:
             draw.text(position, text[:50], fill=color)
     
+    def _font(self, size: int):
+        """Boyuta göre TrueType font - bir kez yüklenir, sonra cache'ten"""
+        font = self._font_cache.get(size)
+        if font is None:
+            try:
+                font = ImageFont.truetype(FONT_PATH, size)
+            except OSError:
+                logger.warning(f"Font bulunamadı ({FONT_PATH}), default bitmap font kullanılıyor")
+                font = ImageFont.load_default()
+            self._font_cache[size] = font
+        return font
+    
     def _draw_wrapped_text(self, draw, text: str, position: tuple, size: int, color: str, max_width: int):
         """Wrapped text çiz"""
+        font = self._font(size)
         words = text.split()
         lines = []
         current_line = []
         
+        # Satır genişliği gerçek font ölçüsüyle; kelime başına tek getlength çağrısı
+        space_width = font.getlength(' ')
+        current_width = 0
         for word in words:
-            test_line = ' '.join(current_line + [word])
-            if len(test_line) * 12 <= max_width:  # Rough estimate
+            word_width = font.getlength(word)
+            test_width = current_width + space_width + word_width if current_line else word_width
+            
+            if test_width <= max_width:
                 current_line.append(word)
+                current_width = test_width
+            elif current_line:
+                lines.append(' '.join(current_line))
+                current_line = [word]
+                current_width = word_width
             else:
-                if current_line:
-                    lines.append(' '.join(current_line))
-                    current_line = [word]
+                lines.append(word)
         
         if current_line:
             lines.append(' '.join(current_line))
         
-        # Draw lines
-        y_offset = 0
-        line_height = size + 10
+        if not lines:
+            return
         
-        for line in lines[:5]:  # Max 5 lines
-            self._draw_text_overlay(draw, line, (position[0], position[1] + y_offset), size, color)
-            y_offset += line_height
+        # Draw lines - tek multiline_text çağrısı, satır aralığı size + 10
+        # (multiline_text satır yüksekliği = "A" yüksekliği + spacing)
+        spacing = size + 10 - draw.textbbox((0, 0), "A", font=font)[3]
+        draw.multiline_text(position, '\n'.join(lines[:5]), fill=color, font=font, spacing=spacing)  # Max 5 lines
     
     def _draw_keyword_badges(self, draw, keywords: List[str], position: tuple, colors: dict):
         """Keyword badge'leri çiz"""
@@ -633,26 +780,27 @@ class StableDiffusionImageGenerator:
             filename = f"{prefix}_{timestamp}_{unique_id}.png"
             filepath = os.path.join(tmp_dir, filename)
             
-            # Save with high quality
-            img.save(filepath, "PNG", quality=95, optimize=True)
+            # Kayıpsız, hızlı zlib (level 1) - optimize pass yok; quality PNG'de etkisiz
+            img.save(filepath, "PNG", compress_level=1)
             
-            print(f"🖼️ [STABLE DIFFUSION] Image saved: {filename}")
-            print(f"📁 [LOCATION] {tmp_dir}")
-            print(f"📏 [SIZE] {img.size[0]}x{img.size[1]} pixels")
-            logger.info(f"Stable Diffusion image saved: {filename}")
+            _dbg("🖼️ [SAVE] Image saved: %s (%dx%d)", filepath, img.size[0], img.size[1])
             
             return filepath
             
         except Exception as e:
-            print(f"❌ [SAVE ERROR] Failed to save image: {e}")
             logger.error(f"Failed to save image: {e}")
             raise
 
 # Singleton instance
 _sd_generator = None
+_sd_generator_lock = threading.Lock()
 
 def get_stable_diffusion_generator() -> StableDiffusionImageGenerator:
     global _sd_generator
     if _sd_generator is None:
-        _sd_generator = StableDiffusionImageGenerator()
+        with _sd_generator_lock:
+            if _sd_generator is None:
+                generator = StableDiffusionImageGenerator()
+                generator._warmup()
+                _sd_generator = generator
     return _sd_generator
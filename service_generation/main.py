@@ -3,9 +3,9 @@ from routes import generation_routes
 import uvicorn
 import logging
 
-# Logging seviyesini DEBUG yap
+# Logging seviyesi INFO - request başına debug logları kapalı
 logging.basicConfig(
-    level=logging.DEBUG,
+    level=logging.INFO,
     format='%(asctime)s - %(name)s - %(levelname)s - %(message)s'
 )
 
@@ -33,5 +33,5 @@ if __name__ == "__main__":
         host="0.0.0.0",
         port=8004,  # Generation servisi için port 8004
         reload=True,
-        log_level="debug"  # Debug logging
+        log_level="info"
     )
@@ -3,6 +3,8 @@ from fastapi.responses import FileResponse
 from typing import List, Optional, Dict, Any
 from pydantic import BaseModel, ValidationError
 from helpers.diffusion_image_generator import get_diffusion_generator
+from helpers.diffusion_server import get_diffusion_generator_client
+import asyncio
 import logging
 import json
 import os
@@ -11,6 +13,9 @@ logger = logging.getLogger(__name__)
 
 router = APIRouter(prefix="/generate", tags=["Generation"])
 
+# Üretilen dosya uzantısı -> Content-Type (generator'lar PNG / WEBP / JPEG kaydeder)
+_MEDIA_TYPES = {".png": "image/png", ".webp": "image/webp", ".jpg": "image/jpeg", ".jpeg": "image/jpeg"}
+
 # Request models
 class ImageGenerationRequest(BaseModel):
     visual_summary: str
@@ -58,7 +63,11 @@ async def generate_instagram_poster(raw_request: Request, request: ImageGenerati
         print(f"🎨 [POSTER DEBUG] Visual: {request.visual_summary[:50]}...")
         print(f"🎨 [POSTER DEBUG] Keywords: {request.keywords}")
         
-        diffusion_generator = get_diffusion_generator()
+        # Paylaşılan modda tüm worker'lar tek generator sürecini kullanır
+        if os.getenv("SD_SHARED_GENERATOR") == "1":
+            diffusion_generator = await asyncio.to_thread(get_diffusion_generator_client)
+        else:
+            diffusion_generator = get_diffusion_generator()
         
         # Content data hazırla
         content_data = {
@@ -76,7 +85,9 @@ async def generate_instagram_poster(raw_request: Request, request: ImageGenerati
             }
         
         # Diffusion generator ile oluştur
-        image_path = diffusion_generator.generate_instagram_image(
+        # Thread'de çalıştır - event loop bloklanmaz, eşzamanlı istekler aynı batch'e girebilir
+        image_path = await asyncio.to_thread(
+            diffusion_generator.generate_instagram_image,
             content_data=content_data,
             trend_data=trend_data,
             style=request.poster_style
@@ -123,7 +134,7 @@ async def download_poster(filename: str):
         return FileResponse(
             path=file_path,
             filename=filename,
-            media_type='image/png'
+            media_type=_MEDIA_TYPES.get(os.path.splitext(filename)[1].lower(), "application/octet-stream")
         )
         
     except FileNotFoundError:
@@ -9,7 +9,7 @@ def validate_image_path(image_path: str) -> bool:
         return False
     
     # Check if it's an image file
-    valid_extensions = {'.png', '.jpg', '.jpeg', '.bmp', '.tiff'}
+    valid_extensions = {'.png', '.jpg', '.jpeg', '.webp', '.bmp', '.tiff'}
     _, ext = os.path.splitext(image_path.lower())
     
     return ext in valid_extensions